@@ -0,0 +1,33 @@
+import time
+
+from hisaab.benchmarks.synthetic import make_statement
+from hisaab.utils.column_types import classify_frame
+from hisaab.utils.parsing import has_atleast_one_letter_and_digit, is_int_or_float, is_valid_locale_date
+
+
+def run(rows=20000, baseline=True):
+    """
+    Time the column typing engine against the per cell predicates on a synthetic statement.
+
+    bench --site <site> execute hisaab.benchmarks.column_types.run --kwargs "{'rows': 20000}"
+    """
+    df = make_statement(rows)
+    result = {"rows": len(df), "columns": df.shape[1]}
+
+    start = time.perf_counter()
+    masks = classify_frame(df)
+    result["classify_frame_seconds"] = round(time.perf_counter() - start, 3)
+
+    if baseline:
+        start = time.perf_counter()
+        expected = {
+            "numeric": df.map(is_int_or_float),
+            "date": df.map(is_valid_locale_date),
+            "alnum": df.map(has_atleast_one_letter_and_digit),
+        }
+        result["predicates_seconds"] = round(time.perf_counter() - start, 3)
+        result["speedup"] = round(result["predicates_seconds"] / max(result["classify_frame_seconds"], 1e-9), 1)
+        result["masks_match"] = all(expected[key].astype(bool).equals(masks[key]) for key in expected)
+
+    print(result)
+    return result
@@ -0,0 +1,84 @@
+import json
+import os
+import subprocess
+import sys
+
+import frappe
+
+from hisaab.constants.doctypes import DOCTYPES
+
+# modules the app should only import once a statement is parsed
+HEAVY_MODULES = ["spacy", "pandas", "numpy"]
+
+def get_doctype_modules():
+
+    return [f"hisaab.hisaab.doctype.{frappe.scrub(doctype)}.{frappe.scrub(doctype)}" for doctype in DOCTYPES.values()]
+
+def get_migrate_modules():
+    """What `bench migrate` imports from the app: hooks, every controller and the after_migrate hooks."""
+    from hisaab import hooks
+
+    return ["hisaab.hooks", *get_doctype_modules(), *{method.rsplit(".", 1)[0] for method in hooks.after_migrate}]
+
+def get_request_modules():
+    """What a web request or background job imports from the app before it runs anything: the before_request and before_job hooks."""
+    from hisaab import hooks
+
+    methods = [*getattr(hooks, "before_request", []), *getattr(hooks, "before_job", [])]
+
+    return ["hisaab.hooks", *{method.rsplit(".", 1)[0] for method in methods}]
+
+def run():
+    """
+    Import each group of app modules in a fresh interpreter and report the
+    heavy modules it pulled in and the import time of the app's own modules.
+
+    bench execute hisaab.benchmarks.imports.run
+
+    Doctype loading, migrate and request startup should import none of HEAVY_MODULES,
+    the parse group shows what the first parse pays for instead.
+    """
+    groups = {
+        "doctypes": get_doctype_modules(),
+        "migrate": get_migrate_modules(),
+        "request": get_request_modules(),
+        "parse": ["hisaab.scripts.statement_ingestion"],
+    }
+    result = {name: measure_imports(modules) for name, modules in groups.items()}
+
+    print(json.dumps(result, indent=1))
+    return result
+
+def measure_imports(modules):
+    """Import `modules` after frappe in a fresh interpreter, returning the heavy modules loaded and import times."""
+    code = (
+        "import sys, json, time, frappe\n"
+        "start = time.perf_counter()\n"
+        f"for module in {modules!r}: __import__(module)\n"
+        "seconds = time.perf_counter() - start\n"
+        f"print(json.dumps({{'seconds': round(seconds, 3), 'heavy': [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))\n"
+    )
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(path for path in sys.path if path)}
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, env=env, check=False
+    )
+    if process.returncode:
+        raise RuntimeError(f"Importing {modules} failed:\n{process.stderr[-2000:]}")
+
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+    result["slowest"] = get_slowest_imports(process.stderr)
+
+    return result
+
+def get_slowest_imports(importtime, limit=10):
+    """Top level imports with the largest cumulative time in `python -X importtime` output, in milliseconds."""
+    imports = []
+    for line in importtime.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # nested imports are indented under the module importing them
+        if cumulative.strip().isdigit() and not name.startswith("  "):
+            imports.append((name.strip(), round(int(cumulative) / 1000, 1)))
+
+    return dict(sorted(imports, key=lambda item: -item[1])[:limit])
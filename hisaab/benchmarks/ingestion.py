@@ -0,0 +1,191 @@
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+import frappe
+
+from hisaab.benchmarks.synthetic import LAYOUTS, make_statement, write_statement
+from hisaab.scripts.statement_file_handling import (
+    detect_transaction_table,
+    find_amount_columns,
+    find_transaction_data,
+    iter_transaction_block,
+    map_columns,
+    scan_statement,
+)
+from hisaab.scripts.transaction_entries import create_transaction_entries, prepare_transaction_entries
+from hisaab.utils.column_types import classify_frame
+from hisaab.utils.nlp import get_rss_mb
+
+SIZES = [100, 1000, 10000, 100000, 1000000]
+
+# a stage is flagged when it gets this much slower than its baseline
+REGRESSION_TOLERANCE = 0.25
+
+# stages shorter than this are too noisy to flag
+MIN_FLAGGED_SECONDS = 0.05
+
+# stages peaking below this many MB are too noisy to flag
+MIN_FLAGGED_MB = 5
+
+# measures compared with the baseline, and the value under which each is not flagged
+COMPARED = {"seconds": MIN_FLAGGED_SECONDS, "peak_mb": MIN_FLAGGED_MB}
+
+def run(sizes=None, layouts=None, reverse=(False, True), insert=False, baseline=None, save=False,
+        tolerance=REGRESSION_TOLERANCE, fail_on_regression=False):
+    """
+    Time and measure each stage of the statement pipeline on synthetic statements
+    of every size, layout and row order.
+
+    bench --site <site> execute hisaab.benchmarks.ingestion.run --kwargs "{'sizes': [1000, 100000], 'baseline': '/tmp/ingestion.json'}"
+
+    Each case runs twice, timed in the first run and memory profiled in the
+    second, as tracemalloc slows every allocation down.
+
+    With `baseline`, the results are compared to the JSON stored there and the
+    stages more than `tolerance` slower or higher in peak memory are reported,
+    `save` writes the new results to it instead. `insert` writes the entries
+    under a BENCH- account and deletes them again, otherwise entries are only built.
+    """
+    cases = {}
+    for size in sizes or SIZES:
+        for layout in layouts or list(LAYOUTS):
+            for reversed_rows in reverse:
+                key = f"{layout}-{size}{'-reversed' if reversed_rows else ''}"
+                timed = run_case(size, layout, reversed_rows, insert)
+                traced = run_case(size, layout, reversed_rows, insert, trace_memory=True)
+                for stage, memory in traced["stages"].items():
+                    if stage != "error" and stage in timed["stages"]:
+                        timed["stages"][stage].update(memory)
+                cases[key] = timed
+                print(key, json.dumps(cases[key]))
+
+    result = {"cases": cases}
+    if baseline and save:
+        with open(baseline, "w") as f:
+            json.dump(result, f, indent=1, sort_keys=True)
+    elif baseline and os.path.exists(baseline):
+        with open(baseline) as f:
+            result["regressions"] = find_regressions(json.load(f), result, tolerance)
+
+        for regression in result["regressions"]:
+            print("regression", json.dumps(regression))
+        if fail_on_regression and result["regressions"]:
+            raise RuntimeError(f"{len(result['regressions'])} stages regressed against {baseline}.")
+
+    return result
+
+def run_case(size, layout, reversed_rows, insert=False, trace_memory=False):
+
+    # large statements are written as csv, writing a million row xlsx takes longer than parsing it
+    extension = ".csv" if size >= 100000 else ".xlsx"
+    df = make_statement(size, layout=layout, reverse=reversed_rows)
+    account_number = f"BENCH-{layout}-{size}"
+
+    stages = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_statement(df, os.path.join(tmp, f"statement{extension}"))
+
+        try:
+            scan = measure(stages, "scan_statement", trace_memory, scan_statement, path)
+            table = measure(stages, "detect_transaction_table", trace_memory, detect_transaction_table, scan)
+            colmap, header_row = measure(
+                stages, "map_columns", trace_memory, map_columns, table["sample"], table["metadata"]
+            )
+
+            # the in memory detection and amount search on their own, as the first whole-sheet parser ran them
+            measure(stages, "find_transaction_data", trace_memory, find_transaction_data, df.copy())
+            sample = table["sample"]
+            masks = classify_frame(sample)
+            num_cols = [col for col in sample.columns if masks["numeric"][col].any()]
+            measure(stages, "find_amount_columns", trace_memory, find_amount_columns, sample, num_cols)
+
+            header = table["metadata"].loc[header_row]
+            name, build = ("create_transaction_entries", create_entries) if insert else \
+                ("prepare_transaction_entries", prepare_entries)
+            measure(stages, name, trace_memory, build, path, table, header, colmap, account_number)
+        except Exception as e:
+            stages["error"] = repr(e)
+        finally:
+            if insert:
+                # the summaries the insert added go with the entries
+                frappe.db.delete("Transaction Entry", {"account": account_number})
+                frappe.db.delete("Transaction Summary", {"account": account_number})
+                frappe.db.commit()
+
+    return {"rows": size, "file": extension, "stages": stages}
+
+def create_entries(path, table, header, colmap, account_number):
+
+    return sum(
+        create_transaction_entries(txn_data, colmap, account_number)
+        for txn_data in iter_transaction_block(path, table["start"], table["end"], header)
+    )
+
+def prepare_entries(path, table, header, colmap, account_number):
+
+    return sum(
+        len(prepare_transaction_entries(txn_data, colmap, account_number))
+        for txn_data in iter_transaction_block(path, table["start"], table["end"], header)
+    )
+
+def measure(stages, name, trace_memory, fn, *args):
+    """
+    Call `fn`, recording under `name` its wall time, or with `trace_memory` its
+    peak traced allocation and RSS growth instead.
+    """
+    if not trace_memory:
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            stages[name] = {"seconds": round(time.perf_counter() - start, 4)}
+
+    rss_before = get_rss_mb()
+    tracemalloc.start()
+    try:
+        return fn(*args)
+    finally:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        stages[name] = {
+            "peak_mb": round(peak / (1024 * 1024), 1),
+            "rss_delta_mb": round(get_rss_mb() - rss_before, 1),
+        }
+
+def find_regressions(baseline, result, tolerance=REGRESSION_TOLERANCE):
+    """
+    Stages of `result` slower or peaking higher in memory than in `baseline` by
+    more than `tolerance`, or failing where they passed.
+    """
+    regressions = []
+    for key, case in result["cases"].items():
+        expected = baseline.get("cases", {}).get(key)
+        if not expected:
+            continue
+
+        if case["stages"].get("error") and not expected["stages"].get("error"):
+            regressions.append({"case": key, "stage": "error", "error": case["stages"]["error"]})
+
+        for stage, measured in case["stages"].items():
+            reference = expected["stages"].get(stage)
+            if stage == "error" or not reference:
+                continue
+
+            for measure_name, floor in COMPARED.items():
+                value, expected_value = measured.get(measure_name), reference.get(measure_name)
+                if value is None or expected_value is None or value < floor:
+                    continue
+                if value > expected_value * (1 + tolerance):
+                    regressions.append({
+                        "case": key,
+                        "stage": stage,
+                        "measure": measure_name,
+                        measure_name: value,
+                        f"baseline_{measure_name}": expected_value,
+                        "ratio": round(value / max(expected_value, 1e-9), 2),
+                    })
+
+    return regressions
@@ -0,0 +1,80 @@
+import json
+import os
+import time
+
+from hisaab.benchmarks.synthetic import LAYOUTS, make_statement
+from hisaab.utils import nlp as nlp_utils
+from hisaab.utils.hashing import is_blank
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "..", "fixtures", "pattern_definition.json")
+
+def run(statements=20, synonyms=None):
+    """
+    Time header similarity over `statements` uploads spread across the synthetic
+    layouts, the way find_best_candidate used to run it and through make_docs.
+
+    bench --site <site> execute hisaab.benchmarks.nlp.run
+
+    per_string pipes every string on its own through the full pipeline, twice per
+    comparison. pipe embeds each upload's strings in one batch with only the
+    task's components, clearing the Doc cache between uploads, and pipe_cached
+    keeps the cache as a worker does.
+    """
+    import spacy
+
+    synonyms = synonyms or get_alias_synonyms()
+    uploads = [get_header_texts(layout) for layout in list(LAYOUTS) * (statements // len(LAYOUTS) or 1)]
+
+    # the pipeline with every component, as spacy.load gave it before tasks picked theirs
+    full = spacy.load(nlp_utils.DEFAULT_MODEL)
+    nlp_utils.get_nlp("similarity")
+
+    def per_string(headers):
+        for header in headers:
+            for synonym in synonyms:
+                full(header).similarity(full(synonym))
+
+    def pipe(headers, cached):
+        if not cached:
+            nlp_utils._DOCS.clear()
+        docs = dict(zip([*headers, *synonyms], nlp_utils.make_docs([*headers, *synonyms], "similarity"), strict=True))
+        for header in headers:
+            for synonym in synonyms:
+                docs[header].similarity(docs[synonym])
+
+    nlp_utils._DOCS.clear()
+    result = {
+        "uploads": len(uploads),
+        "comparisons": sum(len(headers) for headers in uploads) * len(synonyms),
+        "per_string": time_uploads(uploads, per_string),
+        "pipe": time_uploads(uploads, lambda headers: pipe(headers, cached=False)),
+        "pipe_cached": time_uploads(uploads, lambda headers: pipe(headers, cached=True)),
+    }
+    for case in ("pipe", "pipe_cached"):
+        result[f"{case}_speedup"] = round(result["per_string"] / max(result[case], 1e-9), 1)
+
+    print(json.dumps(result, indent=1))
+    return result
+
+def time_uploads(uploads, fn):
+
+    start = time.perf_counter()
+    for headers in uploads:
+        fn(headers)
+
+    return round(time.perf_counter() - start, 4)
+
+def get_header_texts(layout):
+
+    header = make_statement(10, layout=layout).iloc[11]
+
+    return [str(value).lower() for value in header if not is_blank(value)]
+
+def get_alias_synonyms():
+    """Header Alias synonyms from the fixtures, the strings every upload's headers are compared with."""
+    with open(FIXTURES) as f:
+        definitions = [json.loads(row["pattern"]) for row in json.load(f) if row["for"] == "Header Alias"]
+
+    return list(dict.fromkeys(
+        synonym.lower() for definition in definitions for synonyms in definition.values() for synonym in synonyms
+    ))
@@ -0,0 +1,120 @@
+import hashlib
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+import frappe
+from frappe.utils import now
+
+from hisaab.constants.doctypes import DOCTYPES
+from hisaab.utils.queries import (
+    TRANSACTION_ENTRY_INDEXES,
+    get_entries_query,
+    get_existing_hashes,
+    get_index_name,
+)
+
+BENCH_ACCOUNT_PREFIX = "BENCH-"
+INSERT_BATCH_SIZE = 10000
+
+def run(rows=1_000_000, accounts=20, repeat=50, keep=False, seed=0):
+    """
+    Time the Transaction Entry hot queries against `rows` synthetic entries, with
+    and without the composite indexes, and show the plan of each.
+
+    bench --site <site> execute hisaab.benchmarks.queries.run --kwargs "{'rows': 1000000}"
+
+    Rows are written under BENCH- accounts and deleted afterwards unless `keep`.
+    Run it on a test site, the insert takes a few minutes at a million rows.
+    """
+    rng = random.Random(seed)
+    doctype = DOCTYPES.get("Transaction Entry")
+    result = {"rows": rows, "accounts": accounts}
+
+    existing = frappe.db.count(doctype, {"account": ["like", f"{BENCH_ACCOUNT_PREFIX}%"]})
+    if existing < rows:
+        start = time.perf_counter()
+        insert_rows(rows - existing, accounts, rng, offset=existing)
+        result["insert_seconds"] = round(time.perf_counter() - start, 1)
+
+    account = f"{BENCH_ACCOUNT_PREFIX}{rng.randrange(accounts)}"
+    month_start = date(2022, rng.randint(1, 12), 1)
+    month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+    stored = [get_hash(rng.randrange(rows)) for _ in range(1000)]
+    missing = [get_hash(rows + i) for i in range(1000)]
+    hashes = stored + missing
+
+    queries = {
+        "range": get_entries_query(account, month_start, month_end),
+        "category_range": get_entries_query(account, date(2022, 1, 1), date(2022, 12, 31), subtype="Groceries"),
+        "type_range": get_entries_query(account, date(2022, 1, 1), date(2022, 12, 31), type="Expense"),
+    }
+
+    result["dedup_lookup_ms"] = time_call(lambda: get_existing_hashes(hashes), repeat)
+    for key, query in queries.items():
+        sql = query.get_sql()
+        result[f"{key}_rows"] = len(frappe.db.sql(sql))
+        result[f"{key}_ms"] = time_call(lambda sql=sql: frappe.db.sql(sql), repeat)
+        result[f"{key}_plan"] = explain(sql)
+
+        if frappe.db.db_type != "postgres":
+            # the same query with the composite indexes hidden, for comparison
+            ignored = ", ".join(f"`{get_index_name(fields)}`" for fields in TRANSACTION_ENTRY_INDEXES)
+            unindexed = sql.replace(f"FROM `tab{doctype}`", f"FROM `tab{doctype}` IGNORE INDEX ({ignored})", 1)
+            result[f"{key}_without_indexes_ms"] = time_call(lambda sql=unindexed: frappe.db.sql(sql), max(1, repeat // 10))
+
+    if not keep:
+        frappe.db.delete(doctype, {"account": ["like", f"{BENCH_ACCOUNT_PREFIX}%"]})
+        frappe.db.commit()
+
+    print(result)
+    return result
+
+def insert_rows(count, accounts, rng, offset=0):
+
+    doctype = DOCTYPES.get("Transaction Entry")
+    fields = [
+        "name", "creation", "modified", "owner", "modified_by", "docstatus", "idx", "account", "transaction_date",
+        "party", "type", "status", "subtype", "debit_amount", "credit_amount", "amount", "txn_hash",
+    ]
+    categories = [None, "Groceries", "Rent", "Salary", "Travel", "Utilities"]
+    first_day = date(2020, 1, 1)
+    timestamp = now()
+
+    for start in range(offset, offset + count, INSERT_BATCH_SIZE):
+        values = []
+        for i in range(start, min(offset + count, start + INSERT_BATCH_SIZE)):
+            amount = round(rng.uniform(10, 5000), 2)
+            expense = rng.random() < 0.7
+            values.append((
+                f"bench-{i}", timestamp, timestamp, "Administrator", "Administrator", 0, 0,
+                f"{BENCH_ACCOUNT_PREFIX}{i % accounts}", first_day + timedelta(days=rng.randrange(5 * 365)),
+                f"BENCH {i}", "Expense" if expense else "Income", "Expense" if expense else "Income",
+                rng.choice(categories), amount if expense else 0, 0 if expense else amount, amount, get_hash(i),
+            ))
+        frappe.db.bulk_insert(doctype, fields, values, ignore_duplicates=True, chunk_size=INSERT_BATCH_SIZE)
+        frappe.db.commit()
+
+def get_hash(i):
+
+    return hashlib.sha1(f"bench|{i}".encode()).hexdigest()
+
+def time_call(fn, repeat):
+    """Median milliseconds of `repeat` calls."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return round(statistics.median(timings), 2)
+
+def explain(sql):
+
+    plan = frappe.db.sql(f"EXPLAIN {sql}", as_dict=True)
+    if frappe.db.db_type == "postgres":
+        return [row.get("QUERY PLAN") for row in plan]
+
+    return [{"key": row.get("key"), "rows": row.get("rows"), "type": row.get("type")} for row in plan]
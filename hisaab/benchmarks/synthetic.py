@@ -0,0 +1,124 @@
+import os
+import random
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+NARRATIONS = [
+    "UPI/{ref}/PAYTM/grocery", "NEFT-HDFC{ref}-SALARY", "ATM WDL {ref} MUMBAI", "IMPS/P2A/{ref}/RENT",
+    "POS {ref} AMAZON", "CHQ DEP {ref}", "ACH D- {ref} INSURANCE", "INT.PD:{ref}",
+]
+
+# how each bank lays its statement out: the header cell of every column in
+# order (None for a blank column) and the date format
+LAYOUTS = {
+    "hdfc": {
+        "bank": "HDFC BANK Ltd.",
+        "ifsc": "HDFC0001234",
+        "columns": [
+            ("date", "Date"), ("narration", "Narration"), ("ref", "Chq./Ref.No."), ("value_date", "Value Dt"),
+            ("debit", "Withdrawal Amt."), ("credit", "Deposit Amt."), ("balance", "Closing Balance"),
+        ],
+        "date_format": "%d/%m/%y",
+    },
+    "sbi": {
+        "bank": "State Bank of India",
+        "ifsc": "SBIN0004567",
+        "columns": [
+            ("date", "Txn Date"), ("value_date", "Value Date"), ("narration", "Description"),
+            ("ref", "Ref No./Cheque No."), ("debit", "Debit"), ("credit", "Credit"), ("balance", "Balance"),
+        ],
+        "date_format": "%d %b %Y",
+    },
+    "icici": {
+        "bank": "ICICI Bank Limited",
+        "ifsc": "ICIC0007890",
+        "columns": [
+            ("blank", None), ("serial", "S No."), ("value_date", "Value Date"), ("date", "Transaction Date"),
+            ("ref", "Cheque Number"), ("narration", "Transaction Remarks"), ("debit", "Withdrawal Amount (INR )"),
+            ("credit", "Deposit Amount (INR )"), ("balance", "Balance (INR )"),
+        ],
+        "date_format": "%d-%m-%Y",
+    },
+}
+
+def make_statement(rows=1000, seed=0, metadata_rows=12, footer_rows=4, layout="hdfc", reverse=False):
+    """
+    Build a DataFrame shaped like `pd.read_excel` output of a bank statement: a metadata block,
+    a header row, `rows` transactions and a footer, all in object columns named "Unnamed: n".
+
+    `layout` picks the bank format from LAYOUTS, `reverse` lists the newest transaction first.
+    """
+    spec = LAYOUTS[layout]
+    rng = random.Random(seed)
+    start = date(2020, 4, 1)
+
+    balance = 50000.0
+    records = []
+    for i in range(rows):
+        ref = rng.randint(100000, 999999)
+        txn_date = (start + timedelta(days=i * 365 // max(rows, 1))).strftime(spec["date_format"])
+        if rng.random() < 0.6:
+            debit, credit = round(rng.uniform(10, 5000), 2), np.nan
+            balance -= debit
+        else:
+            debit, credit = np.nan, round(rng.uniform(10, 20000), 2)
+            balance += credit
+
+        values = {
+            "blank": np.nan,
+            "serial": i + 1,
+            "date": txn_date,
+            "value_date": txn_date,
+            "narration": rng.choice(NARRATIONS).format(ref=ref),
+            "ref": f"{ref:016d}",
+            "debit": debit,
+            "credit": credit,
+            "balance": round(balance, 2),
+        }
+        records.append([values[key] for key, _ in spec["columns"]])
+
+    if reverse:
+        records.reverse()
+        for i, record in enumerate(records):
+            for position, (key, _) in enumerate(spec["columns"]):
+                if key == "serial":
+                    record[position] = i + 1
+
+    width = len(spec["columns"])
+    metadata = [[np.nan] * width for _ in range(metadata_rows)]
+    metadata[0][0] = spec["bank"]
+    metadata[2][0] = f"Account No : {rng.randint(10**13, 10**14 - 1)}"
+    metadata[3][0] = f"IFSC : {spec['ifsc']}"
+    metadata[4][0] = f"Statement From : {start:%d/%m/%Y} To : {start + timedelta(days=365):%d/%m/%Y}"
+    metadata[-1] = [np.nan if label is None else label for _, label in spec["columns"]]
+
+    footer = [[np.nan] * width for _ in range(footer_rows)]
+    footer[-1][0] = "*Closing balance includes funds earmarked for hold and uncleared funds"
+
+    df = pd.DataFrame(metadata + records + footer, dtype=object)
+    df.columns = [f"Unnamed: {i}" for i in range(df.shape[1])]
+
+    return df
+
+def get_header_map(layout="hdfc"):
+    """The colmap a correct column mapping gives for `layout`."""
+    labels = dict(LAYOUTS[layout]["columns"])
+
+    return {
+        "transaction_date": labels["date"],
+        "party": labels["narration"],
+        "debit_amount": labels["debit"],
+        "credit_amount": labels["credit"],
+        "remaining_balance": labels["balance"],
+    }
+
+def write_statement(df, path):
+    """Write a synthetic statement the way a bank exports it: no header row or index, xlsx or csv by extension."""
+    if os.path.splitext(path)[1].lower() == ".csv":
+        df.to_csv(path, header=False, index=False)
+    else:
+        df.to_excel(path, header=False, index=False)
+
+    return path
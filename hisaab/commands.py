@@ -0,0 +1,37 @@
+import click
+from frappe.commands import get_site, pass_context
+
+
+@click.command("import-statements")
+@click.argument("paths", nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False, resolve_path=True))
+@click.option("--workers", type=int, help="Worker processes parsing files, defaults to one less than the CPU count")
+@pass_context
+def import_statements(context, paths, workers=None):
+    """Import statement files in parallel and report the throughput."""
+    import frappe
+
+    from hisaab.scripts.bulk_import import bulk_import_statements
+
+    def on_file(result):
+        if result.get("error"):
+            click.secho(f"{result['path']}: failed\n{result['error']}", fg="red")
+        else:
+            click.echo(
+                f"{result['path']}: {result['inserted']}/{result['rows']} rows inserted, "
+                f"parsed in {result['parse_seconds']}s"
+            )
+
+    site = get_site(context)
+    frappe.init(site=site)
+    frappe.connect()
+    try:
+        summary = bulk_import_statements(list(paths), workers, on_file=on_file)
+    finally:
+        frappe.destroy()
+
+    click.echo(
+        f"{summary['files']} files ({summary['failed']} failed), {summary['rows']} rows in {summary['seconds']}s "
+        f"with {summary['workers']} workers: {summary['files_per_second']} files/s, {summary['rows_per_second']} rows/s"
+    )
+
+commands = [import_statements]
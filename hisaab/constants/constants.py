@@ -4,4 +4,13 @@ COLMAP = {
     "debit_amount": None,
     "credit_amount": None,
     "remaining_balance": None
-}
\ No newline at end of file
+}
+
+# Statement Upload field holding the sheet column mapped to each COLMAP key
+COLMAP_FIELDS = {
+    "transaction_date": "date_column",
+    "party": "description_column",
+    "debit_amount": "debit_column",
+    "credit_amount": "credit_column",
+    "remaining_balance": "balance_column"
+}
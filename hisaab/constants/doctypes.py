@@ -1,4 +1,12 @@
 DOCTYPES = {
     "Pattern Definition": "Pattern Definition",
-    "Transaction Entry": "Transaction Entry"
-}
\ No newline at end of file
+    "Transaction Entry": "Transaction Entry",
+    "Statement Upload": "Statement Upload",
+    "Statement Layout": "Statement Layout",
+    "Transaction Summary": "Transaction Summary",
+    "Transaction Category": "Transaction Category",
+    "Categorization Rule": "Categorization Rule",
+    "Party": "Party",
+    "Parse Log": "Parse Log",
+    "Statement Range": "Statement Range"
+}
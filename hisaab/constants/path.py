@@ -1,4 +1,24 @@
-from frappe.utils import get_site_path, get_bench_path
+import frappe
+from frappe.utils import get_bench_path, get_site_path
 
-BENCH_PATH = get_bench_path()
-SITE_PATH  = get_site_path()
\ No newline at end of file
+
+def get_site_file_path(file_path):
+    """
+    Absolute path of a file url like /private/files/statement.xlsx on the current site.
+
+    Resolved on every call rather than at import: a worker serves several sites,
+    and importing the app should not need a site.
+    """
+    return f"{get_bench_path()}/sites{get_site_path()[1:]}{file_path}"
+
+def get_attachment_path(file_url):
+    """
+    Absolute path of an attached file, resolved through its File record so
+    private files and files outside the default folders are found. Falls back to
+    the site path for urls without a File.
+    """
+    name = frappe.db.get_value("File", {"file_url": file_url}, "name")
+    if name:
+        return frappe.get_doc("File", name).get_full_path()
+
+    return get_site_file_path(file_url)
@@ -0,0 +1,23 @@
+# Copyright (c) 2026, Pradyot Raina and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe import _
+from frappe.model.document import Document
+
+from hisaab.utils.categorization import get_regex_rule_error
+
+
+class CategorizationRule(Document):
+
+	def validate(self):
+		if self.rule_type == "Party":
+			self.pattern = None
+			return
+
+		self.party = None
+		if self.rule_type == "Regex":
+			# rules are combined into one regex with a named group per rule, see compile_rules
+			error = get_regex_rule_error(self.pattern or "")
+			if error:
+				frappe.throw(_(error))
@@ -0,0 +1,75 @@
+# Copyright (c) 2026, Pradyot Raina and Contributors
+# See license.txt
+
+# import frappe
+import random
+import re
+
+from frappe.tests.utils import FrappeTestCase
+
+from hisaab.benchmarks.synthetic import NARRATIONS
+from hisaab.utils.categorization import categorize, compile_rules, find_matching_rules, get_regex_rule_error
+
+
+def make_rule(name, rule_type, pattern, category, category_type=None):
+	pattern = pattern if rule_type == "Regex" else pattern.lower()
+	return {
+		"name": name,
+		"rule_type": rule_type,
+		"pattern": pattern,
+		"category": category,
+		"category_type": category_type,
+	}
+
+
+class TestCategorizationRule(FrappeTestCase):
+	def test_compiled_rules_match_each_rule_alone(self):
+		rng = random.Random(0)
+		words = ["upi", "neft", "atm", "amazon", "amazon pay", "pay", "paytm", "rent", "salary", "pos", "chq", "int.pd"]
+		rules = [make_rule(f"literal-{i}", "Contains", rng.choice(words), f"C{i}") for i in range(40)]
+		rules += [
+			make_rule("regex-0", "Regex", r"imps/p2a/\d+", "Transfers"),
+			make_rule("regex-1", "Regex", r"^ach d-", "Insurance"),
+		]
+		categorizer = compile_rules(rules)
+
+		for _ in range(300):
+			text = rng.choice(NARRATIONS).format(ref=rng.randint(100000, 999999))
+			expected = [
+				rule["name"]
+				for rule in rules
+				if (rule["rule_type"] == "Regex" and re.search(rule["pattern"], text, re.IGNORECASE))
+				or (rule["rule_type"] != "Regex" and rule["pattern"] in text.lower())
+			]
+			self.assertEqual([rule["name"] for rule in find_matching_rules(text, categorizer)], expected)
+
+	def test_category_type_must_match_entry(self):
+		categorizer = compile_rules([
+			make_rule("refund", "Contains", "amazon", "Refunds", "Income"),
+			make_rule("shopping", "Contains", "amazon pay", "Shopping", "Expense"),
+		])
+
+		self.assertEqual(categorize("POS 1 AMAZON PAY", "Expense", categorizer)["name"], "shopping")
+		self.assertEqual(categorize("POS 1 AMAZON PAY", "Income", categorizer)["name"], "refund")
+		self.assertIsNone(categorize("ATM WDL", "Expense", categorizer))
+
+	def test_rules_matching_at_one_position_keep_their_types(self):
+		categorizer = compile_rules([
+			make_rule("refund", "Regex", r"amazon", "Refunds", "Income"),
+			make_rule("shopping", "Regex", r"amazon\s*pay", "Shopping", "Expense"),
+		])
+
+		self.assertEqual(categorize("POS 1 AMAZON PAY", "Expense", categorizer)["name"], "shopping")
+		self.assertEqual(categorize("POS 1 AMAZON PAY", "Income", categorizer)["name"], "refund")
+
+	def test_rules_that_cannot_be_combined_are_rejected(self):
+		for pattern in (r"(?i)salary", r"(rent)\s+\1", r"(?P<acct>\d+)", r"(unclosed"):
+			self.assertIsNotNone(get_regex_rule_error(pattern), pattern)
+		self.assertIsNone(get_regex_rule_error(r"(?i:salary)\s+\\1"))
+
+		# a bad rule stored before validation is skipped, the others still match
+		categorizer = compile_rules([
+			make_rule("bad", "Regex", r"(?i)salary", "Income"),
+			make_rule("salary", "Regex", r"neft.*salary", "Salary"),
+		])
+		self.assertEqual([rule["name"] for rule in find_matching_rules("NEFT-HDFC1-SALARY", categorizer)], ["salary"])
@@ -0,0 +1,33 @@
+# Copyright (c) 2026, Pradyot Raina and Contributors
+# See license.txt
+
+# import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from hisaab.benchmarks.synthetic import make_statement
+from hisaab.utils.column_types import classify_frame
+from hisaab.utils.profiling import count, span, start_trace, stop_trace
+
+
+class TestParseLog(FrappeTestCase):
+	def test_trace_collects_spans_and_counters(self):
+		df = make_statement(500)
+
+		start_trace(profile=True)
+		for chunk in (df.iloc[:300], df.iloc[300:]):
+			with span("Read") as record:
+				classify_frame(chunk)
+				record["rows"] = len(chunk)
+			count("layout.miss")
+		trace = stop_trace()
+
+		self.assertEqual(trace["spans"]["Read"]["calls"], 2)
+		self.assertEqual(trace["spans"]["Read"]["rows"], len(df))
+		self.assertEqual(trace["spans"]["classify_frame"]["rows"], len(df))
+		self.assertEqual(trace["counters"], {"layout.miss": 2})
+		self.assertIn("classify_frame", trace["profile"])
+
+		# nothing is recorded once the trace is stopped
+		with span("Read"):
+			count("layout.miss")
+		self.assertIsNone(stop_trace())
@@ -1,9 +1,29 @@
 # Copyright (c) 2025, Pradyot Raina and contributors
 # For license information, please see license.txt
 
-# import frappe
+import json
+
+import frappe
 from frappe.model.document import Document
 
+from hisaab.utils.patterns import get_regex_patterns, validate_regex
+
 
 class PatternDefinition(Document):
-	pass
+
+	def validate(self):
+		if self.type == "RegEx" and self.pattern:
+			try:
+				validate_regex(json.loads(self.pattern), self.get_saved_regex())
+			except (RuntimeError, ValueError) as e:
+				frappe.throw(str(e))
+
+	def get_saved_regex(self):
+		# the target's other definitions, compiled into one expression with this one
+		saved = frappe.get_all(
+			self.doctype,
+			filters={"type": "RegEx", "for": self.get("for"), "name": ["!=", self.name or ""]},
+			pluck="pattern",
+		)
+
+		return [pattern for definition in saved if definition for pattern in get_regex_patterns(json.loads(definition))]
@@ -2,8 +2,83 @@
 # See license.txt
 
 # import frappe
+import json
+import os
+from unittest.mock import patch
+
+import numpy as np
 from frappe.tests.utils import FrappeTestCase
 
+from hisaab.benchmarks.synthetic import LAYOUTS, make_statement
+from hisaab.utils.patterns import compile_regex, embed_texts, find_best_header, search_regex, validate_regex
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "..", "..", "..", "fixtures", "pattern_definition.json")
+
 
 class TestPatternDefinition(FrappeTestCase):
-	pass
+	def test_best_header_matches_pairwise_similarity(self):
+		rng = np.random.default_rng(0)
+		texts = ["date", "narration", "chq./ref.no.", "value dt", "withdrawal amt.", "deposit amt."]
+		vectors = {text: vector / np.linalg.norm(vector) for text, vector in zip(texts, rng.normal(size=(len(texts), 8)), strict=True)}
+		synonyms = rng.normal(size=(3, 8))
+		synonyms /= np.linalg.norm(synonyms, axis=1, keepdims=True)
+		index = {"vectors": {"debit": synonyms}, "exact": {"debit": {"withdrawal", "dr"}}}
+
+		candidates = ["Narration", "Chq./Ref.No.", "Withdrawal Amt.", "Deposit Amt."]
+		expected = max(
+			candidates, key=lambda candidate: sum(vectors[candidate.lower()] @ synonym for synonym in synonyms)
+		)
+		self.assertEqual(find_best_header(candidates, "debit", vectors, index), expected)
+
+		index["exact"]["debit"].add("deposit amt.")
+		self.assertEqual(find_best_header(candidates, "debit", vectors, index), "Deposit Amt.")
+
+	def test_texts_are_embedded_once_with_unit_vectors(self):
+		vectors = {"date": [3.0, 4.0], "narration": [0.0, 0.0]}
+
+		def docs(texts, task):
+			return [type("Doc", (), {"vector": np.array(vectors[text])})() for text in texts]
+
+		with patch("hisaab.utils.patterns.make_docs", docs):
+			embedded = embed_texts(["date", "narration", "date"])
+
+		self.assertEqual(list(embedded), ["date", "narration"])
+		np.testing.assert_allclose(embedded["date"], [0.6, 0.8], rtol=1e-6)
+		self.assertEqual(embedded["narration"].tolist(), [0.0, 0.0])
+
+	def test_fixture_regex_finds_account_details(self):
+		with open(FIXTURES) as f:
+			definitions = [row for row in json.load(f) if row["type"] == "RegEx"]
+		compiled = {row["for"]: compile_regex(json.loads(row["pattern"])) for row in definitions}
+
+		for layout in LAYOUTS:
+			df = make_statement(50, layout=layout)
+			text = df.iloc[:11].to_string(index=False, header=False, na_rep="")
+
+			self.assertEqual(search_regex(compiled["Account Number"], text), df.iloc[2, 0].split(": ")[1])
+			self.assertEqual(search_regex(compiled["IFSC Code"], text), LAYOUTS[layout]["ifsc"])
+
+	def test_combined_regex_reports_the_earliest_match(self):
+		compiled = compile_regex([r"A/C\s*(\d+)", r"Account\s*No\s*:\s*(\d+)", r"CUST\d+"])
+
+		self.assertEqual(search_regex(compiled, "Account No : 123 and A/C 456"), "123")
+		self.assertEqual(search_regex(compiled, "A/C 456 and Account No : 123"), "456")
+		self.assertEqual(search_regex(compiled, "id CUST42"), "CUST42")
+		self.assertIsNone(search_regex(compiled, "nothing here"))
+
+		with self.assertRaises(RuntimeError):
+			validate_regex(["(unclosed"])
+
+	def test_regex_is_validated_with_the_saved_patterns(self):
+		saved = [r"A/C\s*(\d+)"]
+		validate_regex(r"Account\s*No\s*:\s*(\d+)", saved)
+
+		# each compiles on its own, not once wrapped in the groups compile_regex adds
+		for definition in (r"(?P<_0>\d+)", r"(?P<number>\d+)", r"(\d)\1", r"(?i)account\s*(\d+)"):
+			with self.assertRaises(RuntimeError):
+				validate_regex([definition], saved)
+
+		with open(FIXTURES) as f:
+			for row in json.load(f):
+				if row["type"] == "RegEx":
+					validate_regex(json.loads(row["pattern"]))
@@ -0,0 +1,39 @@
+# Copyright (c) 2026, Pradyot Raina and Contributors
+# See license.txt
+
+# import frappe
+import os
+import tempfile
+
+from frappe.tests.utils import FrappeTestCase
+
+from hisaab.benchmarks.synthetic import get_header_map, make_statement
+from hisaab.scripts.statement_layouts import (
+	find_block_end,
+	get_column_positions,
+	get_header_tokens,
+	is_balance_consistent,
+)
+from hisaab.utils.readers import iter_statement_chunks
+
+COLMAP = get_header_map("hdfc")
+
+
+class TestStatementLayout(FrappeTestCase):
+	def test_cached_layout_finds_block(self):
+		df = make_statement(1234)
+		with tempfile.TemporaryDirectory() as tmp:
+			path = os.path.join(tmp, "statement.csv")
+			df.to_csv(path, header=False, index=False)
+
+			header = next(iter_statement_chunks(path)).loc[11]
+			columns = get_column_positions(header, COLMAP)
+			end, sample = find_block_end(iter_statement_chunks(path, chunk_size=100), 12, columns)
+
+		self.assertEqual(get_header_tokens(header)[-1], "closing balance")
+		self.assertEqual(end, 1246)
+		self.assertEqual(len(sample), 1234)
+		self.assertTrue(is_balance_consistent(sample, columns))
+
+		swapped = {**columns, "debit_amount": columns["credit_amount"], "credit_amount": columns["debit_amount"]}
+		self.assertFalse(is_balance_consistent(sample, swapped))
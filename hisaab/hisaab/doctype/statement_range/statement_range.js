@@ -0,0 +1,8 @@
+// Copyright (c) 2026, Pradyot Raina and contributors
+// For license information, please see license.txt
+
+// frappe.ui.form.on("Statement Range", {
+// 	refresh(frm) {
+
+// 	},
+// });
@@ -0,0 +1,13 @@
+# Copyright (c) 2026, Pradyot Raina and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class StatementRange(Document):
+	pass
+
+def on_doctype_update():
+	# ranges are looked up by digest within one account, see scripts/statement_digests.py
+	frappe.db.add_index("Statement Range", ["account_number", "digest"])
@@ -0,0 +1,57 @@
+# Copyright (c) 2026, Pradyot Raina and Contributors
+# See license.txt
+
+# import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from hisaab.benchmarks.synthetic import make_statement
+from hisaab.scripts.statement_digests import (
+	add_block_digests,
+	drop_imported_rows,
+	finish_block_digests,
+	new_block_digests,
+)
+from hisaab.utils.hashing import get_row_digests
+
+
+def get_digests(block, chunk_size=250):
+	digests = new_block_digests()
+	for start in range(0, len(block), chunk_size):
+		add_block_digests(digests, block.iloc[start:start + chunk_size])
+
+	return finish_block_digests(digests)
+
+
+class TestStatementRange(FrappeTestCase):
+	def test_overlapping_statements_share_ranges(self):
+		rows = make_statement(3000).iloc[12:]
+		earlier = rows.iloc[:2000]
+		# the later statement starts within the earlier one and sits lower in its sheet
+		later = rows.iloc[700:].copy()
+		later.index = later.index + 5
+
+		sheet, ranges = get_digests(earlier)
+		self.assertEqual(sheet, get_digests(earlier, chunk_size=999)[0])
+		self.assertEqual((ranges[0][0], ranges[-1][1]), (earlier.index[0], earlier.index[-1] + 1))
+		# one digest per row, so the ranges tile the block without gaps
+		self.assertEqual(len(get_row_digests(earlier)), len(earlier))
+		self.assertEqual(sum(end - start for start, end, _ in ranges), len(earlier))
+
+		# ints and floats of the same amount digest alike
+		as_floats = earlier.copy()
+		as_floats.iloc[:, 4] = as_floats.iloc[:, 4].astype(float)
+		self.assertEqual(sheet, get_digests(as_floats)[0])
+
+		known = {digest for _, _, digest in ranges}
+		_, later_ranges = get_digests(later)
+		imported = [(start, end) for start, end, digest in later_ranges if digest in known]
+		new_rows = drop_imported_rows(later, imported)
+
+		# only rows up to the last range boundary before the earlier statement ends are skipped
+		skipped = later.index.difference(new_rows.index)
+		self.assertGreater(len(skipped), 1000)
+		self.assertLessEqual(skipped.max(), earlier.index[-1] + 5)
+		self.assertTrue(later.loc[skipped].reset_index(drop=True).equals(
+			rows.loc[skipped - 5].reset_index(drop=True)
+		))
+		self.assertEqual(new_rows.index[-1], later.index[-1])
@@ -1,8 +1,29 @@
 // Copyright (c) 2025, Pradyot Raina and contributors
 // For license information, please see license.txt
 
-// frappe.ui.form.on("Statement Upload", {
-// 	refresh(frm) {
+frappe.ui.form.on("Statement Upload", {
+	setup(frm) {
+		frappe.realtime.on("statement_upload_progress", (data) => {
+			if (data.statement_upload !== frm.doc.name) return;
 
-// 	},
-// });
+			frm.dashboard.show_progress(__("Import"), data.progress, __(data.status));
+			if (["Completed", "Failed"].includes(data.status)) {
+				frm.dashboard.hide_progress(__("Import"));
+				frm.reload_doc();
+			}
+		});
+	},
+
+	refresh(frm) {
+		if (!frm.is_new() && !["Queued", "Completed"].includes(frm.doc.status)) {
+			frm.add_custom_button(__("Resume Import"), () =>
+				frm.call("resume_import").then(() => frm.reload_doc())
+			);
+		}
+		if (frm.doc.staged_file && !frm.doc.rows_inserted && frm.doc.status !== "Queued") {
+			frm.add_custom_button(__("Remap Columns"), () =>
+				frm.call("remap_columns").then(() => frm.reload_doc())
+			);
+		}
+	},
+});
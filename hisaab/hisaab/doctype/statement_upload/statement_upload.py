@@ -1,21 +1,78 @@
 # Copyright (c) 2025, Pradyot Raina and contributors
 # For license information, please see license.txt
 
+import frappe
 from frappe.model.document import Document
-from hisaab.scripts.statement_file_handling import parse_excel_file
+from frappe.utils import cint
+
+from hisaab.constants.constants import COLMAP_FIELDS
+from hisaab.constants.path import get_attachment_path
+from hisaab.scripts.statement_digests import find_duplicate_upload
+from hisaab.utils.hashing import get_file_digest
+
 
 class StatementUpload(Document):
-	
-	def before_insert(self):
 
+	def before_insert(self):
 		if self.statement_file:
-			account_number, ifsc, colmap = parse_excel_file(self.statement_file)
-			self.account_number = account_number
-			self.ifsc = ifsc
-			self.update({
-				"date_column": colmap.get("date"),
-				"description_column": colmap.get("description"),
-				"debit_column": colmap.get("debit"),
-				"credit_column": colmap.get("credit"),
-				"balance_column": colmap.get("balance")
-			})
+			self.status = "Queued"
+			self.file_digest = get_file_digest(get_attachment_path(self.statement_file))
+
+	def after_insert(self):
+		if not self.statement_file:
+			return
+
+		# a file imported before returns at once, without a job
+		duplicate = find_duplicate_upload(self, "file_digest")
+		if duplicate:
+			self.db_set({"status": "Completed", "duplicate_of": duplicate})
+			return
+
+		# parsing runs in a background job, see statement_ingestion
+		enqueue_import(self.name)
+
+	def on_trash(self):
+		frappe.db.delete("Statement Range", {"statement_upload": self.name})
+
+	@frappe.whitelist()
+	def resume_import(self):
+		if self.status in ("Queued", "Completed"):
+			frappe.throw(frappe._("Import is already {0}.").format(frappe._(self.status)))
+
+		self.db_set({"status": "Queued", "error": None})
+		enqueue_import(self.name)
+
+	@frappe.whitelist()
+	def remap_columns(self, colmap=None, header_row=None):
+		# the corrected mapping is checked against the staged rows, the sheet is not read
+		from hisaab.scripts.statement_ingestion import remap_statement_columns
+
+		if not self.staged_file:
+			frappe.throw(frappe._("The rows of this statement were not staged, upload it again to remap its columns."))
+		if self.rows_inserted:
+			frappe.throw(frappe._("Entries were already inserted with the current mapping."))
+
+		# by default the mapping is the one on the form, as corrected there
+		if colmap is None:
+			colmap = {key: self.get(field) for key, field in COLMAP_FIELDS.items()}
+		header_row = self.header_row if header_row is None else cint(header_row)
+		remap_statement_columns(self, frappe.parse_json(colmap), header_row)
+
+		self.db_set({"status": "Queued", "error": None, "last_completed_stage": "Map Columns"})
+		enqueue_import(self.name)
+
+	@frappe.whitelist()
+	def get_staged_preview(self, start=0, page_length=20):
+		from hisaab.scripts.statement_file_handling import get_statement_path
+		from hisaab.scripts.statement_staging import get_staged_rows
+
+		if not self.staged_file:
+			return None
+
+		return get_staged_rows(get_statement_path(self.staged_file), cint(start), cint(page_length))
+
+def enqueue_import(statement_upload):
+	# the ingestion modules pull in pandas and spacy, loading the doctype should not
+	from hisaab.scripts.statement_ingestion import enqueue_statement_import
+
+	enqueue_statement_import(statement_upload)
@@ -2,8 +2,188 @@
 # See license.txt
 
 # import frappe
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
 from frappe.tests.utils import FrappeTestCase
 
+from hisaab.benchmarks.imports import (
+	get_doctype_modules,
+	get_migrate_modules,
+	get_request_modules,
+	measure_imports,
+)
+from hisaab.benchmarks.synthetic import get_header_map, make_statement, write_statement
+from hisaab.scripts.statement_file_handling import (
+	find_amount_columns,
+	get_runs,
+	iter_transaction_block,
+	scan_statement,
+)
+from hisaab.scripts.statement_staging import (
+	get_staged_table,
+	get_staging_schema,
+	iter_block,
+	iter_staged_block,
+	write_staged_block,
+)
+from hisaab.scripts.transaction_entries import build_transaction_entries
+from hisaab.utils.column_types import classify_frame
+from hisaab.utils.hashing import hash_transaction_entries
+from hisaab.utils.parsing import (
+	evaluate_combo,
+	has_atleast_one_letter_and_digit,
+	is_int_or_float,
+	is_valid_locale_date,
+)
+from hisaab.utils.readers import get_delimiter, get_statement_sheet, iter_statement_chunks
+
 
 class TestStatementUpload(FrappeTestCase):
-	pass
+	def test_cell_masks_match_predicates(self):
+		df = make_statement(500)
+		df.iloc[3, 1] = "today"
+		df.iloc[4, 2] = "1_000"
+		df.iloc[5, 3] = "CHQ DEP 12"
+
+		masks = classify_frame(df)
+
+		self.assertTrue(masks["numeric"].equals(df.map(is_int_or_float).astype(bool)))
+		self.assertTrue(masks["date"].equals(df.map(is_valid_locale_date).astype(bool)))
+		self.assertTrue(masks["alnum"].equals(df.map(has_atleast_one_letter_and_digit).astype(bool)))
+
+	def test_amount_columns_match_exhaustive_search(self):
+		txn_data = make_statement(200).iloc[12:212].reset_index(drop=True)
+		rng = np.random.default_rng(0)
+		for i in range(6):
+			txn_data[f"noise_{i}"] = rng.normal(size=len(txn_data)) * 1000
+
+		num_cols = [col for col in txn_data.columns if col not in ("Unnamed: 0", "Unnamed: 1", "Unnamed: 3")]
+		combos = []
+		for credit in num_cols:
+			for debit in num_cols:
+				for balance in num_cols:
+					if len({credit, debit, balance}) < 3:
+						continue
+					res = evaluate_combo(txn_data, credit, debit, balance)
+					if res:
+						combos.append({**res, "credit_col": credit, "debit_col": debit, "balance_col": balance})
+		expected = max(combos, key=lambda x: x["score"])
+
+		result = find_amount_columns(txn_data, num_cols)
+
+		for key in ("credit_col", "debit_col", "balance_col", "orientation"):
+			self.assertEqual(result[key], expected[key])
+		self.assertEqual(result["balance_col"], "Unnamed: 6")
+		self.assertAlmostEqual(result["score"], expected["score"], places=6)
+
+	def test_transaction_sheet_is_sniffed_and_picked(self):
+		df = make_statement(300)
+		with tempfile.TemporaryDirectory() as tmp:
+			workbook = os.path.join(tmp, "statement.xlsx")
+			with pd.ExcelWriter(workbook) as writer:
+				pd.DataFrame([["Summary", None], ["Closing Balance", 1200.5]]).to_excel(
+					writer, sheet_name="Summary", header=False, index=False
+				)
+				pd.DataFrame({"code": range(500), "name": ["branch"] * 500}).to_excel(
+					writer, sheet_name="Branches", header=False, index=False
+				)
+				df.to_excel(writer, sheet_name="Transactions", header=False, index=False)
+
+			# banks hand out tab separated utf-16 text and html tables named .xls
+			tabs = os.path.join(tmp, "tabs.xls")
+			df.to_csv(tabs, sep="\t", header=False, index=False, encoding="utf-16")
+			page = os.path.join(tmp, "page.xls")
+			with open(page, "w") as f:
+				f.write("<html><body><table><tr><td>Branch</td><td>MG Road</td></tr></table>")
+				f.write(df.fillna("").to_html(header=False, index=False))
+				f.write("</body></html>")
+
+			self.assertEqual(get_statement_sheet(workbook), ("xlsx", 2))
+			self.assertEqual(get_statement_sheet(tabs), ("csv", 0))
+			self.assertEqual(get_statement_sheet(page), ("html", 1))
+			for path in (workbook, tabs, page):
+				block = pd.concat(list(iter_statement_chunks(path, chunk_size=100)))
+				self.assertEqual(block.shape, df.shape)
+				self.assertEqual(block.iloc[11].tolist(), df.iloc[11].tolist())
+
+	def test_delimiter_splits_the_rows_evenly(self):
+		# commas in the details and amounts of a semicolon separated export
+		sample = "Account: 1234, MG Road\nDate;Narration;Debit;Credit;Balance\n" + "".join(
+			f"0{day}/01/24;UPI,GROCER;1,234.50;;10,000.00\n" for day in range(1, 8)
+		)
+		self.assertEqual(get_delimiter(sample), ";")
+		self.assertEqual(get_delimiter('Date,Narration,Amount\n01/01/24,"NEFT; SALARY",100\n02/01/24,UPI,5\n'), ",")
+
+	def test_runs_close_at_the_mask_edges(self):
+		# a run touching either end of the mask still has an end to pair with its start
+		for mask, runs in (
+			([True, True, False, True], [(0, 2), (3, 4)]),
+			([False, True, True, True], [(1, 4)]),
+			([True] * 5, [(0, 5)]),
+			([False] * 3, []),
+			([], []),
+		):
+			self.assertEqual(get_runs(np.array(mask, dtype=bool)), runs)
+
+	def test_streamed_scan_spans_chunks(self):
+		df = make_statement(1234)
+		with tempfile.TemporaryDirectory() as tmp:
+			path = os.path.join(tmp, "statement.csv")
+			df.to_csv(path, header=False, index=False)
+
+			scan = scan_statement(path, chunk_size=100)
+			best = scan["best"]
+			self.assertEqual(scan["runs"], [(12, 1246)])
+			self.assertEqual(len(best["sample"]), 1234)
+
+			header = scan["head"].loc[11]
+			block = pd.concat(list(iter_transaction_block(path, best["start"], best["end"], header, chunk_size=100)))
+
+		self.assertEqual(len(block), 1234)
+		self.assertEqual(list(block.columns), df.iloc[11].tolist())
+		self.assertEqual(block.iloc[-1]["Date"], df.iloc[1245, 0])
+
+	def test_loading_the_app_skips_parsing_dependencies(self):
+		# controllers, migrate hooks and request hooks import none of spacy, pandas or numpy
+		for modules in (get_doctype_modules(), get_migrate_modules(), get_request_modules()):
+			self.assertEqual(measure_imports(modules)["heavy"], [])
+
+	def test_staged_block_reads_like_the_sheet(self):
+		for layout, extension in (("hdfc", ".xlsx"), ("icici", ".csv")):
+			df = make_statement(700, layout=layout)
+			colmap = get_header_map(layout)
+			with tempfile.TemporaryDirectory() as tmp:
+				path = write_statement(df, os.path.join(tmp, f"statement{extension}"))
+				scan = scan_statement(path, chunk_size=300)
+				best = scan["best"]
+				metadata = pd.concat([scan["head"], scan["tail"]])
+				table = {
+					"start": best["start"],
+					"end": best["end"],
+					"metadata": metadata[(metadata.index < best["start"]) | (metadata.index >= best["end"])],
+					"sample": best["sample"],
+				}
+
+				# every chunk has a column per schema field, however many the sheet's rows fill
+				schema = get_staging_schema(table)
+				for block in iter_block(path, table, chunk_size=300):
+					self.assertEqual(list(block.columns), [int(field.name) for field in schema])
+
+				staged_path = os.path.join(tmp, "statement.arrow")
+				self.assertTrue(write_staged_block(path, table, staged_path, chunk_size=300))
+
+				staged = get_staged_table(staged_path)
+				header = table["metadata"].loc[11]
+				self.assertEqual(staged["metadata"].loc[11].tolist(), header.tolist())
+				self.assertEqual((staged["start"], staged["end"]), (12, 712))
+
+				sheet = pd.concat(list(iter_transaction_block(path, best["start"], best["end"], header, chunk_size=300)))
+				rows = pd.concat(list(iter_staged_block(staged_path, staged["metadata"].loc[11], chunk_size=300)))
+
+			self.assertEqual(list(rows.index), list(sheet.index))
+			expected = build_transaction_entries(sheet, colmap)
+			entries = build_transaction_entries(rows, colmap)
+			self.assertEqual(hash_transaction_entries(entries, "1").tolist(), hash_transaction_entries(expected, "1").tolist())
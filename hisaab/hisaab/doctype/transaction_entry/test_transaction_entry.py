@@ -2,8 +2,117 @@
 # See license.txt
 
 # import frappe
+from datetime import date, datetime
+from unittest.mock import patch
+
+import frappe
+import pandas as pd
 from frappe.tests.utils import FrappeTestCase
 
+from hisaab.benchmarks.synthetic import LAYOUTS, get_header_map, make_statement
+from hisaab.hisaab.doctype.transaction_entry.transaction_entry import get_float_value
+from hisaab.scripts.transaction_entries import build_transaction_entries
+from hisaab.scripts.transactions import decode_cursor, get_page
+from hisaab.utils.column_types import get_date_format, to_dates
+from hisaab.utils.hashing import get_transaction_hash, hash_transaction_entries
+
 
 class TestTransactionEntry(FrappeTestCase):
-	pass
+	def test_dates_are_read_with_the_column_format(self):
+		for layout in ("hdfc", "sbi", "icici"):
+			df = make_statement(400, layout=layout)
+			txn_data = df.iloc[12:412].copy()
+			txn_data.columns = [str(label) for label in df.iloc[11].tolist()]
+			colmap = get_header_map(layout)
+			date_format = LAYOUTS[layout]["date_format"]
+
+			self.assertEqual(get_date_format(txn_data[colmap["transaction_date"]]), date_format)
+			entries = build_transaction_entries(txn_data, colmap)
+			expected = pd.to_datetime(txn_data[colmap["transaction_date"]], format=date_format).dt.date
+			self.assertEqual(entries["transaction_date"].tolist(), expected.tolist())
+
+	def test_ambiguous_dates_are_day_first(self):
+		# no day above 12, every cell fits both orders
+		dates = pd.Series(["01/04/20", "02/04/20", " 12/05/20", None, "", datetime(2020, 6, 3, 10, 30)])
+
+		self.assertEqual(get_date_format(dates), "%d/%m/%y")
+		self.assertEqual(
+			to_dates(dates).tolist(),
+			[date(2020, 4, 1), date(2020, 4, 2), date(2020, 5, 12), None, None, date(2020, 6, 3)],
+		)
+		# a cell the format does not fit is still read day first
+		self.assertEqual(to_dates(pd.Series(["5/4/2020"]), "%d/%m/%y").tolist(), [date(2020, 4, 5)])
+		# cells the format misses stay lined up with the ones it reads
+		self.assertEqual(
+			to_dates(pd.Series(["01/04/20", "5/4/2020", "02/04/20", "01/04/20"]), "%d/%m/%y").tolist(),
+			[date(2020, 4, 1), date(2020, 4, 5), date(2020, 4, 2), date(2020, 4, 1)],
+		)
+
+	def test_pages_follow_the_cursor(self):
+		# entries over three days in (date, name) order, the way the index returns them
+		rows = [{"name": f"e{i:03d}", "transaction_date": date(2024, 1, 1 + i // 40)} for i in range(100)]
+
+		pages, after = [], None
+		while True:
+			remaining = [row for row in rows if not after or (row["transaction_date"], row["name"]) > after]
+			page = get_page(remaining[:31], 30)
+			pages.append(page["entries"])
+			if not page["next_cursor"]:
+				break
+			after = decode_cursor(page["next_cursor"])
+
+		self.assertEqual([len(page) for page in pages], [30, 30, 30, 10])
+		self.assertEqual([row for page in pages for row in page], rows)
+		self.assertEqual(decode_cursor(f"2024-01-02|{rows[69]['name']}"), (date(2024, 1, 2), "e069"))
+
+	def test_amounts_accept_currency_strings(self):
+		self.assertEqual(get_float_value("1,234.50"), 1234.5)
+		self.assertEqual(get_float_value(" 12,34,567 "), 1234567.0)
+		self.assertEqual(get_float_value(""), 0.0)
+		self.assertEqual(get_float_value(None), 0.0)
+		self.assertEqual(get_float_value(99), 99.0)
+
+	def test_row_hash_matches_the_vectorized_hash(self):
+		entries = pd.DataFrame({
+			"transaction_date": [date(2024, 1, 5)] * 3,
+			"credit_amount": [0.0, 12.5, 0.0],
+			"debit_amount": [99.999, 0.0, 7.0],
+			"remaining_balance": [1000.0, None, 5.0],
+			"party": [" UPI-GROCER ", float("nan"), 4521],
+		})
+
+		expected = hash_transaction_entries(entries, "1").tolist()
+		hashes = [
+			get_transaction_hash("1", row.transaction_date, row.credit_amount, row.debit_amount, row.remaining_balance, row.party)
+			for row in entries.astype(object).itertuples()
+		]
+		self.assertEqual(hashes, expected)
+
+	def test_insert_writes_the_entry_once(self):
+		queries, commits, jobs = [], [], []
+		sql = frappe.db.sql
+
+		def record_sql(query, *args, **kwargs):
+			queries.append(str(query).strip().lower())
+			return sql(query, *args, **kwargs)
+
+		with patch.object(frappe.db, "sql", record_sql), patch.object(frappe.db, "commit", lambda: commits.append(1)), \
+				patch("frappe.enqueue", lambda method, **kwargs: jobs.append((method, kwargs.get("from_date")))):
+			entry = frappe.get_doc({
+				"doctype": "Transaction Entry",
+				"account": "TEST-QUERY-COUNT",
+				"transaction_date": "2024-01-05",
+				"party": "UPI-GROCER",
+				"debit_amount": "1,234.50",
+				"credit_amount": "",
+				"remaining_balance": "10,000.00",
+			}).insert()
+
+		# one insert for the entry and one upsert for its month, the balance chain is checked in a job
+		ledger = [query.split("`")[1] for query in queries if "`tabtransaction entry`" in query or "`tabtransaction summary`" in query]
+		self.assertEqual(ledger, ["tabtransaction entry", "tabtransaction summary"])
+		self.assertEqual([job for job in jobs if str(job[0]).startswith("hisaab.")], [("hisaab.scripts.ledger.verify_balance_chain", "2024-01-05")])
+		self.assertEqual(commits, [])
+		self.assertEqual((entry.amount, entry.type, entry.status), (1234.5, "Expense", "Expense"))
+		self.assertEqual(frappe.db.get_value("Transaction Entry", entry.name, ["amount", "type", "status"]), (1234.5, "Expense", "Expense"))
+		frappe.db.rollback()
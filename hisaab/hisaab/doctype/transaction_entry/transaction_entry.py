@@ -1,32 +1,89 @@
 # Copyright (c) 2025, Pradyot Raina and contributors
 # For license information, please see license.txt
 
-# import frappe
+import frappe
 from frappe.model.document import Document
+from frappe.utils import getdate
+
+from hisaab.scripts.ledger import CHAIN_FIELDS, SUMMARY_FIELDS, enqueue_balance_chain, update_entry_summaries
+from hisaab.utils.categorization import categorize
+from hisaab.utils.hashing import get_transaction_hash
+from hisaab.utils.queries import TRANSACTION_ENTRY_INDEXES
 
 
 class TransactionEntry(Document):
-	
+
 	def before_insert(self):
-		pass
-	
-	def after_insert(self):
-		if get_float_value(self.debit_amount) > 0:
-			self.db_set("amount", self.debit_amount, commit=True, update_modified=False)
-			self.db_set("type", "Expense", commit=True, update_modified=False)
-			self.db_set("status", "Expense", commit=True, update_modified=False)
-		elif get_float_value(self.credit_amount) > 0:
-			self.db_set("amount", self.credit_amount, commit=True, update_modified=False)
-			self.db_set("type", "Income", commit=True, update_modified=False)
-			self.db_set("status", "Income", commit=True, update_modified=False)
-	
+		# derived here so the row is written once, with no updates after the insert
+		self.set_amount_and_type()
+
+		if not self.txn_hash:
+			self.txn_hash = get_transaction_hash(
+				self.account,
+				self.transaction_date,
+				self.credit_amount,
+				self.debit_amount,
+				self.remaining_balance,
+				self.party,
+			)
+
+		if not self.subtype:
+			rule = categorize(self.party, self.type)
+			if rule:
+				self.subtype = rule["category"]
+				self.category_rule = rule["name"]
+
+	def set_amount_and_type(self):
+		self.debit_amount = get_float_value(self.debit_amount)
+		self.credit_amount = get_float_value(self.credit_amount)
+		if isinstance(self.remaining_balance, str):
+			# a blank balance stays unknown rather than zero, the balance chain reports a gap
+			self.remaining_balance = get_float_value(self.remaining_balance) if self.remaining_balance.strip() else None
+
+		if self.debit_amount > 0:
+			self.amount, self.type = self.debit_amount, "Expense"
+		elif self.credit_amount > 0:
+			self.amount, self.type = self.credit_amount, "Income"
+
 	def before_save(self):
 		self.status = self.type
 
-def get_float_value(value):
+		# a category picked by hand is never overwritten by the rules
+		before = self.get_doc_before_save()
+		if before and before.subtype != self.subtype:
+			self.category_rule = None
+
+	def on_update(self):
+		before = self.get_doc_before_save()
 
+		if not before or has_changed(before, self, SUMMARY_FIELDS):
+			update_entry_summaries(before, self)
+
+		if not before or has_changed(before, self, CHAIN_FIELDS):
+			if before and before.account != self.account:
+				enqueue_balance_chain(before.account, before.transaction_date)
+			dates = [self.transaction_date, before.transaction_date if before else None]
+			enqueue_balance_chain(self.account, min(getdate(date) for date in dates if date))
+
+	def on_trash(self):
+		update_entry_summaries(before=self)
+
+	def after_delete(self):
+		enqueue_balance_chain(self.account, self.transaction_date)
+
+def on_doctype_update():
+	# composite indexes behind the account, date, type and category filters, see utils/queries.py
+	for fields in TRANSACTION_ENTRY_INDEXES:
+		frappe.db.add_index("Transaction Entry", fields)
+
+def has_changed(before, after, fields):
+
+	return any(before.get(field) != after.get(field) for field in fields)
+
+def get_float_value(value):
+	"""A sheet or form amount as a float, "1,234.50" included, blanks as 0."""
 	if isinstance(value, str):
-		value = value.strip()
+		value = value.replace(",", "").strip()
 		return float(value) if value else 0.0
-	
-	return float(value)
\ No newline at end of file
+
+	return float(value) if value is not None else 0.0
@@ -0,0 +1,51 @@
+# Copyright (c) 2026, Pradyot Raina and Contributors
+# See license.txt
+
+# import frappe
+import random
+
+import frappe
+import pandas as pd
+from frappe.tests.utils import FrappeTestCase
+
+from hisaab.benchmarks.synthetic import get_header_map, make_statement
+from hisaab.scripts.ledger import check_balance_chain
+from hisaab.scripts.transaction_entries import build_transaction_entries
+
+COLMAP = get_header_map("hdfc")
+
+
+class TestTransactionSummary(FrappeTestCase):
+	def get_entries(self, rows=2000):
+		df = make_statement(rows)
+		txn_data = df.iloc[12:12 + rows].copy()
+		txn_data.columns = df.iloc[11].tolist()
+		entries = build_transaction_entries(txn_data, COLMAP)
+		entries["transaction_date"] = pd.to_datetime(txn_data["Date"], format="%d/%m/%y").dt.date.to_numpy()
+
+		return [frappe._dict(row, name=str(i)) for i, row in enumerate(entries.to_dict("records"))]
+
+	def test_balance_chain_follows_balances_within_a_day(self):
+		entries = self.get_entries()
+		# the order of entries sharing a date is lost once they are stored
+		random.Random(0).shuffle(entries)
+		entries.sort(key=lambda entry: entry.transaction_date)
+
+		statuses = [status for _, status, _ in check_balance_chain(entries)]
+
+		self.assertEqual(statuses[0], "Opening")
+		self.assertEqual(set(statuses[1:]), {"Verified"})
+
+	def test_balance_chain_flags_mismatch_and_gap(self):
+		entries = self.get_entries(200)
+		entries[50].remaining_balance += 100
+		entries[120].remaining_balance = None
+		for entry in entries[51:120]:
+			entry.remaining_balance += 100
+
+		results = {entry.name: (status, difference) for entry, status, difference in check_balance_chain(entries)}
+
+		self.assertEqual(results["50"], ("Mismatch", 100))
+		self.assertEqual(results["120"][0], "Gap")
+		self.assertEqual(results["121"][0], "Gap")
+		self.assertEqual(sum(status == "Verified" for status, _ in results.values()), 200 - 4)
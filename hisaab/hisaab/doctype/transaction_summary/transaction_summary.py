@@ -0,0 +1,12 @@
+# Copyright (c) 2026, Pradyot Raina and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class TransactionSummary(Document):
+	pass
+
+def on_doctype_update():
+	frappe.db.add_index("Transaction Summary", ["account", "month"])
@@ -87,6 +87,12 @@ from hisaab.constants.doctypes import DOCTYPES
 # before_install = "hisaab.install.before_install"
 # after_install = "hisaab.install.after_install"
 
+# fixtures and patches may have changed the cached definitions and rules
+after_migrate = [
+	"hisaab.utils.patterns.clear_pattern_cache",
+	"hisaab.utils.categorization.clear_categorization_cache",
+]
+
 # Uninstallation
 # ------------
 
@@ -147,6 +153,31 @@ from hisaab.constants.doctypes import DOCTYPES
 # 	}
 # }
 
+doc_events = {
+	DOCTYPES.get("Pattern Definition"): {
+		"on_update": "hisaab.utils.patterns.clear_pattern_cache",
+		"on_trash": "hisaab.utils.patterns.clear_pattern_cache",
+	},
+	# rules read party identifiers and category types, a change to any of them recategorizes
+	DOCTYPES.get("Categorization Rule"): {
+		"on_update": "hisaab.scripts.categorization.on_rules_changed",
+		"on_trash": "hisaab.scripts.categorization.on_rules_changed",
+	},
+	DOCTYPES.get("Party"): {
+		"on_update": "hisaab.scripts.categorization.on_rules_changed",
+		"on_trash": "hisaab.scripts.categorization.on_rules_changed",
+	},
+	DOCTYPES.get("Transaction Category"): {
+		"on_update": "hisaab.scripts.categorization.on_rules_changed",
+		"on_trash": "hisaab.scripts.categorization.on_rules_changed",
+	},
+	# cached account aggregates, see scripts/transactions.py. on_update runs after an insert too
+	DOCTYPES.get("Transaction Entry"): {
+		"on_update": "hisaab.scripts.transactions.on_entry_changed",
+		"on_trash": "hisaab.scripts.transactions.on_entry_changed",
+	},
+}
+
 # Scheduled Tasks
 # ---------------
 
@@ -205,6 +236,10 @@ from hisaab.constants.doctypes import DOCTYPES
 # ----------
 # before_job = ["hisaab.utils.before_job"]
 # after_job = ["hisaab.utils.after_job"]
+# spaCy models are cached per process, warm them once per worker when
+# `hisaab_preload_nlp_models` is set in site config. statements are only
+# parsed in jobs, web workers never load them
+before_job = ["hisaab.utils.nlp.warm_up"]
 
 # User Data Protection
 # --------------------
@@ -246,4 +281,4 @@ from hisaab.constants.doctypes import DOCTYPES
 
 fixtures = [
     DOCTYPES.get("Pattern Definition")
-]
\ No newline at end of file
+]
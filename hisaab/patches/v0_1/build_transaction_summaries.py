@@ -0,0 +1,6 @@
+from hisaab.scripts.ledger import rebuild_ledger
+
+
+def execute():
+
+    rebuild_ledger()
@@ -0,0 +1,35 @@
+import frappe
+import pandas as pd
+
+from hisaab.constants.doctypes import DOCTYPES
+from hisaab.utils.hashing import hash_transaction_entries
+
+
+def execute():
+
+    doctype = DOCTYPES.get("Transaction Entry")
+    entries = frappe.get_all(
+        doctype,
+        filters={"txn_hash": ["is", "not set"]},
+        fields=["name", "account", "transaction_date", "credit_amount", "debit_amount", "remaining_balance", "party"],
+        order_by="creation asc",
+    )
+    if not entries:
+        return
+
+    entries = pd.DataFrame(entries)
+    hashes = pd.concat([
+        hash_transaction_entries(group, account) for account, group in entries.groupby(entries["account"].fillna(""))
+    ])
+    entries["txn_hash"] = hashes
+
+    # keep the earliest of any rows that were imported twice, the rest stay
+    # unhashed rather than violating the unique index
+    stored = set(frappe.get_all(doctype, filters={"txn_hash": ["is", "set"]}, pluck="txn_hash"))
+    entries = entries[~entries["txn_hash"].isin(stored)].drop_duplicates("txn_hash")
+
+    frappe.db.bulk_update(
+        doctype,
+        {row.name: {"txn_hash": row.txn_hash} for row in entries.itertuples(index=False)},
+        update_modified=False,
+    )
@@ -0,0 +1,113 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import frappe
+import pandas as pd
+
+from hisaab.scripts.ledger import verify_balance_chain
+from hisaab.scripts.statement_file_handling import iter_transaction_block
+from hisaab.scripts.statement_layouts import map_statement, store_statement_layout
+from hisaab.scripts.transaction_entries import insert_transaction_entries, prepare_transaction_entries
+from hisaab.utils.nlp import warm_up
+
+
+def bulk_import_statements(paths, workers=None, on_file=None):
+    """
+    Import many statement files at once. Reading, table detection, column mapping
+    and entry building run in a pool of worker processes with the spaCy models
+    preloaded, while this process is the only one writing to the database.
+
+    `on_file(result)` is called as each file is written. Returns the per file
+    results and the throughput of the whole run.
+    """
+    workers = workers or max(1, min(len(paths), (os.cpu_count() or 2) - 1))
+    start = time.perf_counter()
+
+    results = []
+    # spawned workers open their own site connection instead of sharing this one
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_worker,
+        initargs=(frappe.local.site, frappe.local.sites_path),
+    ) as pool:
+        futures = {pool.submit(parse_statement, path): path for path in paths}
+        for future in as_completed(futures):
+            try:
+                result = write_statement(future.result())
+            except Exception:
+                frappe.db.rollback()
+                result = {"path": futures[future], "error": frappe.get_traceback(), "rows": 0, "inserted": 0}
+
+            results.append(result)
+            if on_file:
+                on_file(result)
+
+    seconds = time.perf_counter() - start
+    rows = sum(result["rows"] for result in results)
+
+    return {
+        "files": len(results),
+        "failed": sum(1 for result in results if result.get("error")),
+        "rows": rows,
+        "inserted": sum(result["inserted"] for result in results),
+        "seconds": round(seconds, 3),
+        "files_per_second": round(len(results) / seconds, 2) if seconds else 0,
+        "rows_per_second": round(rows / seconds, 1) if seconds else 0,
+        "workers": workers,
+        "results": results,
+    }
+
+def init_worker(site, sites_path):
+
+    frappe.init(site=site, sites_path=sites_path)
+    frappe.connect()
+    warm_up(force=True)
+
+def parse_statement(path):
+    """Everything but the inserts for one file, run in a worker. Only reads the database."""
+    start = time.perf_counter()
+
+    # the same layout lookup, detection and mapping as statement_ingestion
+    mapped = map_statement(path)
+    table, colmap, header_row, date_format = mapped["table"], mapped["colmap"], mapped["header_row"], mapped["date_format"]
+
+    header = table["metadata"].loc[header_row]
+    entries = pd.concat([
+        prepare_transaction_entries(txn_data, colmap, table["account_number"], date_format)
+        for txn_data in iter_transaction_block(path, table["start"], table["end"], header)
+    ])
+
+    return {
+        "path": path,
+        "layout": mapped["layout"],
+        # only what save_statement_layout needs travels back to the writer
+        "table": {"start": table["start"], "metadata": table["metadata"]},
+        "account_number": table["account_number"],
+        "ifsc": table["ifsc"],
+        "colmap": colmap,
+        "header_row": header_row,
+        "date_format": date_format,
+        "entries": entries.drop_duplicates("txn_hash"),
+        "parse_seconds": round(time.perf_counter() - start, 3),
+    }
+
+def write_statement(parsed):
+
+    parsed["layout"] = store_statement_layout(parsed)
+    frappe.db.commit()
+
+    inserted = insert_transaction_entries(parsed["entries"], parsed["account_number"])
+    verify_balance_chain(parsed["account_number"])
+    frappe.db.commit()
+
+    return {
+        "path": parsed["path"],
+        "account_number": parsed["account_number"],
+        "layout": parsed["layout"],
+        "rows": len(parsed["entries"]),
+        "inserted": inserted,
+        "parse_seconds": parsed["parse_seconds"],
+    }
@@ -0,0 +1,70 @@
+import frappe
+import pandas as pd
+
+from hisaab.constants.doctypes import DOCTYPES
+from hisaab.scripts.ledger import SUMMARY_FIELDS, apply_summary_deltas
+from hisaab.scripts.transactions import clear_aggregates_cache
+from hisaab.utils.categorization import categorize_entries, clear_categorization_cache
+
+# Transaction Entry rows read and updated per commit
+PAGE_SIZE = 20000
+
+def on_rules_changed(doc=None, method=None):
+    """Drop the compiled rules and queue the stored entries to be categorized again."""
+    clear_categorization_cache()
+    frappe.enqueue(
+        "hisaab.scripts.categorization.recategorize_entries",
+        queue="long",
+        timeout=3600,
+        job_id="hisaab::recategorize_entries",
+        deduplicate=True,
+        enqueue_after_commit=True,
+    )
+
+def recategorize_entries(page_size=PAGE_SIZE):
+    """
+    Run the current rules over every entry that has no category or was categorized
+    by a rule, leaving categories set by hand alone. The summaries move with every
+    entry whose category changes. Returns the number of entries updated.
+    """
+    doctype = DOCTYPES.get("Transaction Entry")
+    updated = 0
+    last_name = ""
+    while True:
+        entries = frappe.get_all(
+            doctype,
+            filters={"name": [">", last_name]},
+            or_filters={"subtype": ["is", "not set"], "category_rule": ["is", "set"]},
+            fields=["name", "party", "type", "category_rule", *SUMMARY_FIELDS],
+            order_by="name asc",
+            limit_page_length=page_size,
+        )
+        if not entries:
+            break
+
+        last_name = entries[-1].name
+        entries = pd.DataFrame(entries)
+        categories = categorize_entries(entries)
+
+        changed = entries["subtype"].fillna("").ne(categories["subtype"].fillna("")) | entries["category_rule"].fillna("").ne(
+            categories["category_rule"].fillna("")
+        )
+        if changed.any():
+            before = entries[changed]
+            after = before.assign(**categories[changed])
+
+            frappe.db.bulk_update(doctype, {
+                row.name: {"subtype": row.subtype, "category_rule": row.category_rule}
+                for row in after.itertuples(index=False)
+            }, update_modified=False)
+
+            moved = before["subtype"].fillna("").ne(after["subtype"].fillna(""))
+            apply_summary_deltas(before[moved], sign=-1)
+            apply_summary_deltas(after[moved])
+            updated += int(changed.sum())
+
+        frappe.db.commit()
+        if changed.any():
+            clear_aggregates_cache(entries.loc[changed, "account"].tolist())
+
+    return updated
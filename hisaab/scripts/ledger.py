@@ -0,0 +1,250 @@
+import itertools
+
+import frappe
+from frappe.utils import flt, getdate, now
+
+from hisaab.constants.doctypes import DOCTYPES
+from hisaab.utils.hashing import get_summary_name
+
+# Transaction Entry fields a summary row is keyed on or adds up
+SUMMARY_FIELDS = ["account", "transaction_date", "subtype", "debit_amount", "credit_amount"]
+
+# Transaction Entry fields the running balance chain is checked on
+CHAIN_FIELDS = ["account", "transaction_date", "debit_amount", "credit_amount", "remaining_balance"]
+
+SUMMARY_TOTALS = ["entry_count", "total_debit", "total_credit", "net"]
+
+# balances reconcile when they agree to within rounding
+BALANCE_TOLERANCE = 0.01
+
+# summary rows written per upsert query
+UPSERT_BATCH_SIZE = 500
+
+def apply_summary_deltas(entries, sign=1):
+    """
+    Add (`sign` 1) or remove (`sign` -1) Transaction Entry rows from the Transaction
+    Summary of their account, month and category. Each summary row is updated
+    in place with a single upsert, so concurrent imports never lose counts.
+    """
+    if entries is None or len(entries) == 0:
+        return
+
+    import pandas as pd
+
+    entries = pd.DataFrame(entries)
+    frame = pd.DataFrame({
+        "account": entries["account"].fillna("") if "account" in entries else "",
+        "month": pd.to_datetime(entries["transaction_date"]).dt.to_period("M").dt.to_timestamp().dt.date,
+        "category": entries["subtype"].fillna("") if "subtype" in entries else "",
+        "debit": pd.to_numeric(entries["debit_amount"], errors="coerce").fillna(0),
+        "credit": pd.to_numeric(entries["credit_amount"], errors="coerce").fillna(0),
+    })
+    totals = frame.groupby(["account", "month", "category"], sort=False).agg(
+        entry_count=("debit", "size"), total_debit=("debit", "sum"), total_credit=("credit", "sum")
+    ).reset_index()
+
+    timestamp = now()
+    user = frappe.session.user
+    values = [
+        (
+            get_summary_name(row.account, row.month, row.category), timestamp, timestamp, user, user, 0, 0,
+            row.account or None, row.month, row.category or None,
+            sign * int(row.entry_count), sign * flt(row.total_debit), sign * flt(row.total_credit),
+            sign * flt(row.total_credit - row.total_debit),
+        )
+        for row in totals.itertuples(index=False)
+    ]
+
+    for start in range(0, len(values), UPSERT_BATCH_SIZE):
+        upsert_summaries(values[start:start + UPSERT_BATCH_SIZE])
+
+    if sign < 0:
+        # a summary row with nothing left in it is dropped
+        frappe.db.delete(DOCTYPES.get("Transaction Summary"), {
+            "name": ["in", [value[0] for value in values]],
+            "entry_count": ["<=", 0],
+        })
+
+def upsert_summaries(values):
+
+    table = f"tab{DOCTYPES.get('Transaction Summary')}"
+    columns = [
+        "name", "creation", "modified", "owner", "modified_by", "docstatus", "idx",
+        "account", "month", "category", *SUMMARY_TOTALS,
+    ]
+    placeholders = ", ".join(["(" + ", ".join(["%s"] * len(columns)) + ")"] * len(values))
+
+    if frappe.db.db_type == "postgres":
+        updates = [f"`{field}` = `{table}`.`{field}` + excluded.`{field}`" for field in SUMMARY_TOTALS]
+        conflict = "on conflict (name) do update set " + ", ".join([*updates, "`modified` = excluded.`modified`"])
+    else:
+        updates = [f"`{field}` = `{field}` + values(`{field}`)" for field in SUMMARY_TOTALS]
+        conflict = "on duplicate key update " + ", ".join([*updates, "`modified` = values(`modified`)"])
+
+    frappe.db.sql(
+        f"insert into `{table}` ({', '.join(f'`{column}`' for column in columns)}) values {placeholders} {conflict}",
+        [value for row in values for value in row],
+    )
+
+def update_entry_summaries(before=None, after=None):
+    """Move one entry's contribution from its `before` values to its `after` values, either can be None."""
+    if before:
+        apply_summary_deltas([{field: before.get(field) for field in SUMMARY_FIELDS}], sign=-1)
+    if after:
+        apply_summary_deltas([{field: after.get(field) for field in SUMMARY_FIELDS}])
+
+@frappe.whitelist()
+def get_account_summaries(account=None, from_month=None, to_month=None, category=None):
+    """Summary rows of an account (or every account) by month and category, without touching Transaction Entry."""
+    filters = {}
+    if account:
+        filters["account"] = account
+    if category:
+        filters["category"] = category
+    if from_month and to_month:
+        filters["month"] = ["between", [get_month(from_month), get_month(to_month)]]
+    elif from_month:
+        filters["month"] = [">=", get_month(from_month)]
+    elif to_month:
+        filters["month"] = ["<=", get_month(to_month)]
+
+    return frappe.get_all(
+        DOCTYPES.get("Transaction Summary"),
+        filters=filters,
+        fields=["account", "month", "category", *SUMMARY_TOTALS],
+        order_by="month asc",
+    )
+
+def get_month(value):
+
+    return getdate(value).replace(day=1)
+
+def verify_balance_chain(account, from_date=None):
+    """
+    Check the running balance of `account` from `from_date` on (by default from
+    its earliest unchecked entry) against the entry before it, and store each
+    entry's balance_status and balance_difference. Returns the rows updated.
+    """
+    doctype = DOCTYPES.get("Transaction Entry")
+    account_filter = account if account else ["is", "not set"]
+
+    if from_date is None:
+        from_date = get_boundary_date(doctype, {"account": account_filter, "balance_status": ["is", "not set"]}, "asc")
+        if from_date is None:
+            return 0
+
+    # the day before gives the balance the chain continues from
+    context_date = get_boundary_date(doctype, {"account": account_filter, "transaction_date": ["<", from_date]}, "desc")
+
+    entries = frappe.get_all(
+        doctype,
+        filters={"account": account_filter, "transaction_date": [">=", context_date or from_date]},
+        fields=["name", "transaction_date", "credit_amount", "debit_amount", "remaining_balance",
+                "balance_status", "balance_difference"],
+        order_by="transaction_date asc, idx asc, creation asc",
+    )
+
+    updates = {}
+    for entry, status, difference in check_balance_chain(entries):
+        if context_date and getdate(entry.transaction_date) == getdate(context_date):
+            continue
+        if entry.balance_status != status or flt(entry.balance_difference) != flt(difference):
+            updates[entry.name] = {"balance_status": status, "balance_difference": difference}
+
+    if updates:
+        frappe.db.bulk_update(doctype, updates, update_modified=False)
+
+    return len(updates)
+
+def enqueue_balance_chain(account, from_date=None):
+    """
+    Queue verify_balance_chain for `account` from `from_date` once the transaction
+    commits, so saving an entry by hand does not walk the entries after it.
+    """
+    from_date = str(getdate(from_date)) if from_date else None
+    frappe.enqueue(
+        "hisaab.scripts.ledger.verify_balance_chain",
+        account=account,
+        from_date=from_date,
+        job_id=f"hisaab::verify_balance_chain::{account}::{from_date}",
+        deduplicate=True,
+        enqueue_after_commit=True,
+    )
+
+def get_boundary_date(doctype, filters, order):
+
+    dates = frappe.get_all(doctype, filters=filters, pluck="transaction_date", order_by=f"transaction_date {order}", limit=1)
+
+    return dates[0] if dates else None
+
+def check_balance_chain(entries):
+    """
+    Yield (entry, status, difference) along the running balance of `entries`,
+    which are sorted by date. Entries of the same day are chained in the order
+    their balances follow each other, so the statement's row order does not matter.
+    """
+    previous = None
+    for _, day in itertools.groupby(entries, key=lambda entry: getdate(entry.transaction_date)):
+        for entry in order_day(list(day), previous):
+            yield (entry, *get_balance_status(previous, entry))
+            previous = entry
+
+def order_day(entries, previous):
+
+    remaining = list(entries)
+    ordered = []
+    balance = previous.remaining_balance if previous else None
+    while remaining:
+        following = next((entry for entry in remaining if reconciles(balance, entry)), None)
+        if following is None:
+            # start again from an entry no other entry of the day leads into
+            balances = [entry.remaining_balance for entry in remaining if entry.remaining_balance is not None]
+            following = next(
+                (entry for entry in remaining if not any(reconciles(value, entry) for value in balances)),
+                remaining[0]
+            )
+
+        ordered.append(following)
+        remaining.remove(following)
+        balance = following.remaining_balance
+
+    return ordered
+
+def reconciles(balance, entry):
+
+    if balance is None or entry.remaining_balance is None:
+        return False
+
+    return abs(get_expected_balance(balance, entry) - flt(entry.remaining_balance)) <= BALANCE_TOLERANCE
+
+def get_expected_balance(balance, entry):
+
+    return flt(balance) + flt(entry.credit_amount) - flt(entry.debit_amount)
+
+def get_balance_status(previous, entry):
+
+    if previous is None:
+        return "Opening", 0
+    if previous.remaining_balance is None or entry.remaining_balance is None:
+        return "Gap", 0
+    if reconciles(previous.remaining_balance, entry):
+        return "Verified", 0
+
+    return "Mismatch", flt(flt(entry.remaining_balance) - get_expected_balance(previous.remaining_balance, entry), 2)
+
+def rebuild_ledger():
+    """Recompute every Transaction Summary and balance chain from the stored entries."""
+    entry_doctype = DOCTYPES.get("Transaction Entry")
+    frappe.db.delete(DOCTYPES.get("Transaction Summary"))
+
+    page_length = 50000
+    for start in itertools.count(0, page_length):
+        entries = frappe.get_all(
+            entry_doctype, fields=SUMMARY_FIELDS, order_by="name asc", limit_start=start, limit_page_length=page_length
+        )
+        apply_summary_deltas(entries)
+        if len(entries) < page_length:
+            break
+
+    for account in frappe.get_all(entry_doctype, distinct=True, pluck="account"):
+        verify_balance_chain(account, from_date="1900-01-01")
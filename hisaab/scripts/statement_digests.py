@@ -0,0 +1,123 @@
+import hashlib
+
+import frappe
+from frappe.utils import now
+
+from hisaab.constants.doctypes import DOCTYPES
+from hisaab.utils.hashing import get_row_digests
+
+# a row closes a range when its digest is divisible by this, so statements sharing
+# rows cut them into the same ranges wherever each statement starts
+RANGE_DIVISOR = 64
+
+# a range is closed here when no row closed it earlier
+MAX_RANGE_ROWS = 1024
+
+# digests looked up per query
+LOOKUP_BATCH_SIZE = 1000
+
+def find_duplicate_upload(doc, field, **filters):
+    """The earliest completed Statement Upload other than `doc` with the same digest in `field`."""
+    if not doc.get(field):
+        return None
+
+    return frappe.db.get_value(
+        DOCTYPES.get("Statement Upload"),
+        {field: doc.get(field), "status": "Completed", "name": ["!=", doc.name], **filters},
+        "name",
+        order_by="creation asc",
+    )
+
+def new_block_digests():
+
+    return {"sheet": hashlib.sha1(), "ranges": [], "rows": [], "start": None, "end": None}
+
+def add_block_digests(digests, block):
+    """Fold a chunk of the transaction block into the sheet digest and close the ranges ending in it."""
+    for position, row_digest in zip(block.index.tolist(), get_row_digests(block), strict=True):
+        digests["sheet"].update(row_digest.encode())
+        if digests["start"] is None:
+            digests["start"] = position
+        digests["rows"].append(row_digest)
+        digests["end"] = position + 1
+
+        if int(row_digest[:8], 16) % RANGE_DIVISOR == 0 or len(digests["rows"]) >= MAX_RANGE_ROWS:
+            close_range(digests)
+
+def close_range(digests):
+
+    if digests["rows"]:
+        digest = hashlib.sha1("".join(digests["rows"]).encode()).hexdigest()
+        digests["ranges"].append((digests["start"], digests["end"], digest))
+    digests["rows"], digests["start"] = [], None
+
+def finish_block_digests(digests):
+    """The sheet digest and the ranges of the block as (start, end, digest), rows [start, end) of the sheet."""
+    close_range(digests)
+
+    return digests["sheet"].hexdigest(), digests["ranges"]
+
+def save_range_digests(doc, ranges):
+    """Store the row ranges of `doc`'s transaction block, replacing any stored by an earlier run."""
+    doctype = DOCTYPES.get("Statement Range")
+    frappe.db.delete(doctype, {"statement_upload": doc.name})
+
+    fields = [
+        "name", "creation", "modified", "owner", "modified_by", "docstatus", "idx",
+        "statement_upload", "account_number", "digest", "start_row", "end_row",
+    ]
+    timestamp = now()
+    user = frappe.session.user
+    values = [
+        (frappe.generate_hash(length=10), timestamp, timestamp, user, user, 0, 0,
+         doc.name, doc.account_number, digest, start, end)
+        for start, end, digest in ranges
+    ]
+    frappe.db.bulk_insert(doctype, fields, values)
+
+def get_imported_ranges(doc):
+    """
+    Row ranges of `doc` whose digest a completed upload of the same account also
+    stored: their rows were imported then and can be skipped.
+    """
+    if not doc.account_number:
+        return []
+
+    doctype = DOCTYPES.get("Statement Range")
+    ranges = frappe.get_all(
+        doctype, filters={"statement_upload": doc.name}, fields=["digest", "start_row", "end_row"], order_by="start_row"
+    )
+
+    earlier = []
+    digests = list({r.digest for r in ranges})
+    for start in range(0, len(digests), LOOKUP_BATCH_SIZE):
+        earlier += frappe.get_all(doctype, filters={
+            "digest": ["in", digests[start:start + LOOKUP_BATCH_SIZE]],
+            "account_number": doc.account_number,
+            "statement_upload": ["!=", doc.name],
+        }, fields=["digest", "statement_upload"])
+    if not earlier:
+        return []
+
+    completed = set(frappe.get_all(DOCTYPES.get("Statement Upload"), filters={
+        "name": ["in", list({r.statement_upload for r in earlier})],
+        "status": "Completed",
+    }, pluck="name"))
+    imported = {r.digest for r in earlier if r.statement_upload in completed}
+
+    return [(r.start_row, r.end_row) for r in ranges if r.digest in imported]
+
+def drop_imported_rows(txn_data, ranges):
+    """Rows of `txn_data` outside the sorted, non overlapping sheet row `ranges`."""
+    if not ranges or txn_data.empty:
+        return txn_data
+
+    import numpy as np
+
+    starts, ends = np.array(ranges).T
+    positions = txn_data.index.to_numpy()
+    # the last range starting at or before each row is the only one that can hold it
+    i = np.searchsorted(starts, positions, side="right") - 1
+    imported = (i >= 0) & (positions < ends[np.maximum(i, 0)])
+
+    return txn_data[~imported]
@@ -1,95 +1,204 @@
-import pandas as pd
-import spacy
-import json
-import frappe
 from collections import Counter
-from hisaab.constants.path import BENCH_PATH, SITE_PATH
+
+import numpy as np
+import pandas as pd
+
 from hisaab.constants.constants import COLMAP
-from hisaab.constants.doctypes import DOCTYPES
-from hisaab.utils.parsing import find_info_in_text, is_int_or_float, has_atleast_one_letter_and_digit, evaluate_combo, is_valid_locale_date, find_best_candidate, find_spacy_similarity
-from hisaab.scripts.transaction_entries import create_transaction_entries
-
-def parse_excel_file(file_path):
-    
-    full_path = f"{BENCH_PATH}/sites{SITE_PATH[1:]}{file_path}"
-
-    # parse excel for relevant data
-    df = pd.read_excel(full_path)
-    full_text = df.to_string(index=False, na_rep='')
-
-    # spacy pre processing
-    nlp = spacy.load("en_core_web_lg")
-    doc = nlp(full_text)
-    
-    # find bank, account details
-    account_number = find_info_in_text(look_for="Account Number", spacy_doc=doc, nlp=nlp)
-    ifsc = find_info_in_text(look_for="IFSC Code", spacy_doc=doc, nlp=nlp)
-
-    find_txn_data = find_transaction_data(df)
-
-    colmap = {}
-    if find_txn_data:
-        txn_data, metadata = df.iloc[find_txn_data[1]:find_txn_data[2]], pd.concat([df.iloc[:find_txn_data[1]], df.iloc[find_txn_data[2]:]])
-
-        num_cols = []
-        date_cols = []
-        num_mask = txn_data.applymap(is_int_or_float)
-        date_mask  = txn_data.applymap(is_valid_locale_date)
-        for col in txn_data.columns:
-            if num_mask[col].any():
-                num_cols.append(col)
-            if date_mask[col].all():
-                date_cols.append(col)
-
-        amount_columns = find_amount_columns(txn_data, num_cols)
-
-        # find header row
-        txn_columns = txn_data.dropna(axis=1, how='all').columns
-        txn_header = metadata.dropna(subset=txn_columns)
-
-        # map columns
-        colmap = COLMAP.copy()
-        synonyms = frappe.get_all(
-            DOCTYPES.get("Pattern Definition"),
-            {"for": "Header Alias", "type": "spaCy"},
-            pluck="pattern"
-        )
-        if synonyms:
-            synonyms = json.loads(synonyms[0])
-
-        if len(txn_header) == 1:
-            row_idx = 0
-        else:
-            row_idx_prediction = []
-            for key in ["debit", "credit", "balance"]:
-                candidates = txn_header[amount_columns.get(f"{key}_col")].tolist()
-                row_idx_prediction.append(
-                    candidates.index(find_best_candidate(candidates, synonyms.get(key), nlp))
-                )
-            
-            row_idx = Counter(row_idx_prediction).most_common(1)[0][0]
-        
-        row = txn_header.iloc[row_idx]
-        colmap["debit_amount"]   = row[amount_columns.get("debit_col")]
-        colmap["credit_amount"]  = row[amount_columns.get("credit_col")]
-        colmap["remaining_balance"] = row[amount_columns.get("balance_col")]
-        description_candidates = [ row[col] for col in txn_data.columns.difference(num_cols + date_cols).tolist()]
-        colmap["transaction_date"]    = find_best_candidate([ row[col] for col in date_cols ], synonyms.get("date"), nlp)
-        colmap["party"] = find_best_candidate(description_candidates, synonyms.get("description"), nlp)
-
-    txn_data.columns = row
-    #create transaction entries
-    create_transaction_entries(txn_data.iloc[::-1], colmap, account_number)
-
-    return account_number, ifsc, colmap
-
-def find_transaction_data(df):
-
-    num_counts = df.applymap(is_int_or_float).sum(axis = 1)
-
-    date_mask  = df.applymap(is_valid_locale_date).any(axis = 1)
-
-    alnum_mask = df.applymap(has_atleast_one_letter_and_digit).any(axis = 1)
+from hisaab.constants.path import get_attachment_path
+from hisaab.utils.column_types import classify_frame, get_transaction_rows
+from hisaab.utils.patterns import embed_texts, find_best_header, find_info, get_alias_index
+from hisaab.utils.profiling import span, traced
+from hisaab.utils.readers import CHUNK_SIZE, iter_statement_chunks
+
+# share of rows a column must fill to be tried as the running balance
+BALANCE_MIN_FILL = 0.9
+
+# rows kept from the top and bottom of the sheet and from just before the
+# transaction block, for header detection and nlp
+METADATA_ROWS = 50
+
+# rows of the transaction block used to type and map its columns
+SAMPLE_ROWS = 5000
+
+def get_statement_path(file_path):
+
+    return get_attachment_path(file_path)
+
+def scan_statement(path, chunk_size=CHUNK_SIZE):
+    """
+    Stream the statement once and keep only what detection and mapping need: the
+    runs of transaction-like rows, a sample of the longest one, the rows just
+    before it, and the first and last METADATA_ROWS rows of the sheet.
+    """
+    head = None
+    tail = None
+    runs = []
+    current = None
+    best = None
+
+    for chunk in iter_statement_chunks(path, chunk_size):
+        offset = chunk.index[0]
+        if head is None:
+            head = chunk.iloc[:METADATA_ROWS]
+        elif len(head) < METADATA_ROWS:
+            head = pd.concat([head, chunk.iloc[:METADATA_ROWS - len(head)]])
+
+        is_txn = get_transaction_rows(classify_frame(chunk))
+
+        for start, end in get_runs(is_txn.to_numpy()):
+            if current and current["end"] == offset + start:
+                # the run carries on from the previous chunk
+                current["end"] = offset + end
+                missing = SAMPLE_ROWS - len(current["sample"])
+                if missing > 0:
+                    current["sample"] = pd.concat([current["sample"], chunk.iloc[start:min(end, start + missing)]])
+                continue
+
+            best = close_run(current, runs, best)
+            current = {
+                "start": offset + start,
+                "end": offset + end,
+                # rows before the run, possibly spilling into the previous chunk
+                "context": [tail if start < METADATA_ROWS else None, chunk.iloc[max(0, start - METADATA_ROWS):start]],
+                "sample": chunk.iloc[start:min(end, start + SAMPLE_ROWS)],
+            }
+
+        tail = chunk.iloc[-METADATA_ROWS:] if tail is None or len(chunk) >= METADATA_ROWS else pd.concat([tail, chunk]).iloc[-METADATA_ROWS:]
+
+    best = close_run(current, runs, best)
+
+    return {"runs": runs, "best": best, "head": head, "tail": tail}
+
+def close_run(run, runs, best):
+
+    if not run:
+        return best
+
+    runs.append((run["start"], run["end"]))
+    if best is None or run["end"] - run["start"] > best["end"] - best["start"]:
+        return run
+
+    return best
+
+def get_runs(mask):
+    """(start, end) positions of every run of True in `mask`."""
+    padded = np.concatenate([[False], mask, [False]])
+    changes = np.flatnonzero(padded[1:] != padded[:-1])
+
+    # the padding closes every run, so starts and ends pair up
+    return list(zip(changes[::2].tolist(), changes[1::2].tolist(), strict=True))
+
+def detect_transaction_table(scan):
+    """Pick the transaction block from a statement scan and find the account details around it."""
+    sizes = [end - start for start, end in scan["runs"]]
+    if not sizes or sizes.count(max(sizes)) != 1:
+        #handle transaction data edge case confusion
+        raise RuntimeError("Could not find a single transaction table in the statement.")
+
+    best = scan["best"]
+    context = [part for part in best["context"] if part is not None]
+    metadata = pd.concat([scan["head"], *context, scan["tail"]])
+    metadata = metadata[~metadata.index.duplicated()].sort_index()
+    metadata = metadata[(metadata.index < best["start"]) | (metadata.index >= best["end"])]
+
+    # only the rows around the block are searched, by regex first and spacy if that finds nothing
+    with span("find_info"):
+        info = find_info(metadata.to_string(index=False, header=False, na_rep=''))
+
+    return {
+        "account_number": info.get("Account Number"),
+        "ifsc": info.get("IFSC Code"),
+        "start": int(best["start"]),
+        "end": int(best["end"]),
+        "metadata": metadata,
+        "sample": best["sample"],
+    }
+
+def map_columns(txn_data, metadata, masks=None):
+    """Map the columns of `txn_data` to Transaction Entry fields, returning the colmap and the header row in `metadata`."""
+    if masks is None:
+        masks = classify_frame(txn_data)
+
+    num_cols = []
+    date_cols = []
+    num_mask = masks["numeric"]
+    date_mask  = masks["date"]
+    for col in txn_data.columns:
+        if num_mask[col].any():
+            num_cols.append(col)
+        if date_mask[col].all():
+            date_cols.append(col)
+
+    amount_columns = find_amount_columns(txn_data, num_cols)
+    if not amount_columns:
+        raise RuntimeError("Could not find the debit, credit and balance columns.")
+
+    # find header row
+    txn_columns = txn_data.dropna(axis=1, how='all').columns
+    txn_header = metadata.dropna(subset=txn_columns)
+    if txn_header.empty:
+        raise RuntimeError("Could not find the header row of the transaction table.")
+
+    # map columns
+    colmap = COLMAP.copy()
+    index = get_alias_index()
+
+    # every header cell is vectorized once, in a single nlp.pipe call
+    vectors = embed_texts(str(value).lower() for value in txn_header.to_numpy().ravel())
+
+    if len(txn_header) == 1:
+        row_idx = 0
+    else:
+        row_idx_prediction = []
+        for key in ["debit", "credit", "balance"]:
+            candidates = txn_header[amount_columns.get(f"{key}_col")].tolist()
+            row_idx_prediction.append(
+                candidates.index(find_best_header(candidates, key, vectors, index))
+            )
+
+        row_idx = Counter(row_idx_prediction).most_common(1)[0][0]
+
+    row = txn_header.iloc[row_idx]
+    colmap["debit_amount"]   = row[amount_columns.get("debit_col")]
+    colmap["credit_amount"]  = row[amount_columns.get("credit_col")]
+    colmap["remaining_balance"] = row[amount_columns.get("balance_col")]
+    description_candidates = [ row[col] for col in txn_data.columns.difference(num_cols + date_cols).tolist()]
+    colmap["transaction_date"]    = find_best_header([ row[col] for col in date_cols ], "date", vectors, index)
+    colmap["party"] = find_best_header(description_candidates, "description", vectors, index)
+
+    # headers are stored on the Statement Upload as text
+    return {key: str(value) for key, value in colmap.items()}, int(row.name)
+
+def iter_transaction_block(path, start, end, header, chunk_size=CHUNK_SIZE):
+    """Stream rows [start, end) of the statement in chunks, labelled with the `header` row's cells as text."""
+    labels = [str(label) for label in header.tolist()]
+
+    for chunk in iter_statement_chunks(path, chunk_size):
+        if chunk.index[-1] >= start:
+            block = chunk.loc[max(start, chunk.index[0]):end - 1].reindex(columns=header.index)
+            if not block.empty:
+                block.columns = labels
+                yield block
+
+        if chunk.index[-1] >= end - 1:
+            return
+
+def get_statement_row(path, position, chunk_size=CHUNK_SIZE):
+
+    for chunk in iter_statement_chunks(path, chunk_size):
+        if chunk.index[-1] >= position:
+            return chunk.loc[position]
+
+def find_transaction_data(df, masks=None):
+
+    if masks is None:
+        masks = classify_frame(df)
+
+    num_counts = masks["numeric"].sum(axis = 1)
+
+    date_mask  = masks["date"].any(axis = 1)
+
+    alnum_mask = masks["alnum"].any(axis = 1)
 
     reduced_df = df[(num_counts >= 2) & date_mask & alnum_mask]
 
@@ -102,7 +211,7 @@ def find_transaction_data(df):
         return False
 
 def find_transaction_data_candidates(df: pd.DataFrame):
-    
+
     index = df.index
 
     clusters = (index.diff() != 1).cumsum()
@@ -121,20 +230,74 @@ def find_transaction_data_candidates(df: pd.DataFrame):
 
     return candidate_clusters
 
+@traced("find_amount_columns")
 def find_amount_columns(df, num_cols):
+    """
+    Pick the credit, debit and balance columns whose flows best explain the balance deltas.
 
-    combos = []
-
-    for credit in num_cols:
-        for debit in num_cols:
-            if debit == credit: continue
-            for balance in num_cols:
-                if balance in (credit, debit): continue
-                res = evaluate_combo(df, credit, debit, balance)
-                if res:
-                    res2 = res.copy()
-                    res2.update({"credit_col": credit, "debit_col": debit, "balance_col": balance})
-                    combos.append(res2)
-    if not combos:
+    Scores every (credit, debit, balance) triple the way evaluate_combo does, in
+    both orientations, with a few matrix products over the numeric columns.
+    """
+    if len(num_cols) < 3 or len(df) < 4:
         return {}
-    return sorted(combos, key=lambda x: x["score"], reverse=True)[0]
\ No newline at end of file
+
+    # every numeric column converted once into a shared float matrix
+    values = np.column_stack([pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float) for col in num_cols])
+    filled = np.isfinite(values).mean(axis=0)
+    values = np.nan_to_num(values, nan=0.0)
+
+    n_rows = len(values) - 1
+    k = len(num_cols)
+    deltas = values[1:] - values[:-1]
+    scale = np.maximum(1.0, np.abs(values).mean(axis=0))
+
+    # a running balance is filled on (nearly) every row while credit and debit
+    # are mostly blank, only dense columns are tried as the balance
+    balance_idx = np.flatnonzero(filled >= BALANCE_MIN_FILL)
+    if not len(balance_idx):
+        balance_idx = np.arange(k)
+
+    # flows and balance deltas line up as rows 1.. going forward, and as rows
+    # ..n-1 against the negated deltas going in reverse
+    rmses = np.full((2, len(balance_idx), k, k), np.inf)
+    for orientation, (flows, target) in enumerate(((values[1:], deltas), (values[:-1], -deltas))):
+        gram = flows.T @ flows
+        cross = flows.T @ target
+        squares = (target ** 2).sum(axis=0)
+        diag = np.diag(gram)
+
+        for i, b in enumerate(balance_idx):
+            # sum((r - credit + debit) ** 2) for every credit/debit pair at once
+            sse = (
+                squares[b] + diag[:, None] + diag[None, :]
+                - 2 * cross[:, b][:, None] + 2 * cross[:, b][None, :]
+                - 2 * gram
+            )
+            rmse = np.sqrt(np.clip(sse, 0, None) / n_rows)
+            np.fill_diagonal(rmse, np.inf)
+            rmse[b, :] = np.inf
+            rmse[:, b] = np.inf
+            rmses[orientation, i] = rmse
+
+    normalized = rmses / scale[balance_idx][None, :, None, None]
+    scores = np.minimum(100.0, 100.0 / (1.0 + normalized))
+
+    best = scores.max()
+    if not best > 0:
+        return {}
+
+    # ties resolve in the order the combinations were historically tried
+    ties = np.argwhere(np.isclose(scores, best, rtol=0, atol=1e-9))
+    orientation, i, credit, debit = min(ties.tolist(), key=lambda t: (t[2], t[3], balance_idx[t[1]], t[0]))
+    balance = balance_idx[i]
+
+    return {
+        "orientation": ("forward", "reverse")[orientation],
+        "n_rows": int(n_rows),
+        "rmse": float(rmses[orientation, i, credit, debit]),
+        "normalized_rmse": float(normalized[orientation, i, credit, debit]),
+        "score": float(best),
+        "credit_col": num_cols[credit],
+        "debit_col": num_cols[debit],
+        "balance_col": num_cols[balance],
+    }
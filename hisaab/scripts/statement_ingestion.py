@@ -0,0 +1,311 @@
+import json
+
+import frappe
+from frappe.utils import cint
+
+from hisaab.constants.constants import COLMAP_FIELDS
+from hisaab.constants.doctypes import DOCTYPES
+from hisaab.scripts.ledger import verify_balance_chain
+from hisaab.scripts.statement_digests import (
+    add_block_digests,
+    drop_imported_rows,
+    find_duplicate_upload,
+    finish_block_digests,
+    get_imported_ranges,
+    new_block_digests,
+    save_range_digests,
+)
+from hisaab.scripts.statement_file_handling import (
+    detect_transaction_table,
+    get_statement_path,
+    get_statement_row,
+    iter_transaction_block,
+    scan_statement,
+)
+from hisaab.scripts.statement_layouts import (
+    get_column_positions,
+    get_table_date_format,
+    map_statement,
+    match_statement_layout,
+    save_statement_layout,
+    store_statement_layout,
+)
+from hisaab.scripts.statement_staging import get_staged_table, iter_block, iter_staged_block, stage_statement
+from hisaab.scripts.transaction_entries import create_transaction_entries
+from hisaab.utils.nlp import get_rss_mb
+from hisaab.utils.profiling import count, span, start_trace, stop_trace
+
+PROGRESS_EVENT = "statement_upload_progress"
+
+def enqueue_statement_import(statement_upload):
+
+    frappe.enqueue(
+        "hisaab.scripts.statement_ingestion.import_statement",
+        queue="long",
+        timeout=3600,
+        job_id=f"statement_upload::{statement_upload}",
+        deduplicate=True,
+        enqueue_after_commit=True,
+        statement_upload=statement_upload,
+    )
+
+def import_statement(statement_upload):
+    """
+    Run the import stages of a Statement Upload in order. Stages whose output is
+    already stored on the document are skipped, so a failed or interrupted import
+    resumes where it stopped. The transaction block is staged as an Arrow file
+    once the table is found, mapping and inserting then read it rather than the
+    sheet, which is scanned again only if the block could not be staged.
+
+    Staging also digests the block: a block an earlier upload of the account
+    already imported completes the upload there, and row ranges shared with
+    earlier uploads are skipped by the insert.
+
+    Every run is timed stage by stage into a Parse Log, with a cProfile report
+    when the upload has Profile Import set.
+    """
+    doc = frappe.get_doc(DOCTYPES.get("Statement Upload"), statement_upload)
+    if doc.status == "Completed":
+        return
+
+    state = {}
+    completed = STAGE_NAMES.index(doc.last_completed_stage) if doc.last_completed_stage else -1
+    rows_before = cint(doc.rows_inserted)
+    start_trace(profile=cint(doc.profile_import))
+
+    try:
+        for index, (stage, status, run) in enumerate(STAGES):
+            if not is_stage_pending(stage, index, completed, bool(doc.staged_file)):
+                continue
+
+            set_status(doc, status, index)
+            with span(stage):
+                run(doc, state)
+            doc.db_set("last_completed_stage", stage, update_modified=False)
+            frappe.db.commit()
+
+            if doc.duplicate_of:
+                break
+
+    except Exception:
+        frappe.db.rollback()
+        doc.db_set({"status": "Failed", "error": frappe.get_traceback()}, update_modified=False)
+        save_parse_log(doc, "Failed", cint(doc.rows_inserted) - rows_before)
+        frappe.db.commit()
+        publish_progress(doc, "Failed", 0)
+        raise
+
+    doc.db_set({"status": "Completed", "error": None})
+    save_parse_log(doc, "Completed", cint(doc.rows_inserted) - rows_before)
+    frappe.db.commit()
+    publish_progress(doc, "Completed", 100)
+
+def save_parse_log(doc, status, rows):
+    """Store the trace of this run on a Parse Log. Profile Import is cleared once a profile is captured."""
+    trace = stop_trace()
+    if trace is None:
+        return
+
+    log = frappe.get_doc({
+        "doctype": DOCTYPES.get("Parse Log"),
+        "statement_upload": doc.name,
+        "status": status,
+        "profiled": bool(trace["profile"]),
+        "total_seconds": trace["total_seconds"],
+        "rows": rows,
+        "rss_mb": round(get_rss_mb(), 1),
+        "spans": json.dumps(trace["spans"], indent=1),
+        "counters": json.dumps(trace["counters"], indent=1, sort_keys=True),
+        "profile": trace["profile"],
+        "error": doc.error if status == "Failed" else None,
+    })
+    log.insert(ignore_permissions=True)
+
+    if trace["profile"]:
+        doc.db_set("profile_import", 0, update_modified=False)
+    frappe.logger("hisaab").info({
+        "event": "statement_parsed", "statement_upload": doc.name, "status": status,
+        "total_seconds": trace["total_seconds"], "rows": rows,
+    })
+
+def is_stage_pending(stage, index, completed, staged=False):
+
+    if stage == "Read":
+        # the scan feeds detection, staging and mapping, once staged mapping reads the staged block
+        return completed < STAGE_NAMES.index("Stage Rows" if staged else "Map Columns")
+
+    return index > completed
+
+def read_stage(doc, state):
+
+    state["path"] = get_statement_path(doc.statement_file)
+
+    # a statement in a known layout skips table detection and column mapping
+    layout = match_statement_layout(state["path"])
+    if layout:
+        state["layout"] = layout
+        state["table"] = layout["table"]
+    else:
+        state["scan"] = scan_statement(state["path"])
+
+def detect_table_stage(doc, state):
+
+    table = state.get("table") or detect_transaction_table(state["scan"])
+    state["table"] = table
+
+    doc.db_set({
+        "account_number": table["account_number"],
+        "ifsc": table["ifsc"],
+        "txn_start_row": table["start"],
+        "txn_end_row": table["end"],
+    }, update_modified=False)
+
+def stage_rows_stage(doc, state):
+
+    table = state.get("table") or detect_transaction_table(state["scan"])
+    state["table"] = table
+
+    digests = new_block_digests()
+    with span("digest_rows"):
+        # a statement that can't be staged is read from the sheet by the later stages
+        staged_file = stage_statement(doc, state["path"], table, on_block=lambda block: add_block_digests(digests, block))
+        if not staged_file:
+            # staging stops at the first chunk it can't write, the rest is digested from the sheet
+            digests = new_block_digests()
+            for block in iter_block(state["path"], table):
+                add_block_digests(digests, block)
+
+    sheet_digest, ranges = finish_block_digests(digests)
+    save_range_digests(doc, ranges)
+    doc.db_set({"staged_file": staged_file, "sheet_digest": sheet_digest}, update_modified=False)
+
+    # the same rows in another file, e.g. the statement downloaded again, were already imported
+    if doc.account_number:
+        duplicate = find_duplicate_upload(doc, "sheet_digest", account_number=doc.account_number)
+        if duplicate:
+            doc.db_set("duplicate_of", duplicate, update_modified=False)
+
+def map_columns_stage(doc, state):
+
+    table = state.get("table") or get_current_table(doc, state)
+    state["table"] = table
+
+    # the layout read_stage matched, or a mapping inferred from the detected or staged table
+    mapped = state.get("layout") or map_statement(state.get("path"), table)
+
+    doc.db_set({
+        "header_row": mapped["header_row"],
+        "date_format": mapped["date_format"],
+        "statement_layout": store_statement_layout(mapped),
+        **{COLMAP_FIELDS[key]: value for key, value in mapped["colmap"].items()},
+    }, update_modified=False)
+
+def remap_statement_columns(doc, colmap, header_row):
+    """
+    Store a mapping corrected by hand on `doc` and on the Statement Layout of its
+    header row, so later statements in the layout are mapped with it. The columns
+    must all be cells of `header_row` in the staged block's metadata.
+    """
+    table = get_staged_table(get_statement_path(doc.staged_file))
+    if header_row not in table["metadata"].index:
+        frappe.throw(frappe._("Row {0} is not above or below the transaction rows.").format(header_row))
+
+    colmap = {key: colmap.get(key) for key in COLMAP_FIELDS}
+    if not get_column_positions(table["metadata"].loc[header_row], colmap):
+        frappe.throw(frappe._("Every mapped column must be a heading in row {0}.").format(header_row))
+
+    date_format = get_table_date_format(table, header_row, colmap)
+    layout_name = save_statement_layout(table, colmap, header_row, date_format)
+    # a layout found at the wrong header row would keep matching the statements it was wrong for
+    if doc.statement_layout and doc.statement_layout != layout_name:
+        frappe.db.delete(DOCTYPES.get("Statement Layout"), doc.statement_layout)
+
+    doc.db_set({
+        "header_row": header_row,
+        "date_format": date_format,
+        "statement_layout": layout_name,
+        **{COLMAP_FIELDS[key]: value for key, value in colmap.items()},
+    }, update_modified=False)
+
+def get_current_table(doc, state):
+
+    if doc.staged_file:
+        return get_staged_table(get_statement_path(doc.staged_file))
+
+    return detect_transaction_table(state["scan"])
+
+def insert_stage(doc, state):
+
+    path = state.get("path") or get_statement_path(doc.statement_file)
+    if state.get("table"):
+        header = state["table"]["metadata"].loc[doc.header_row]
+    elif doc.staged_file:
+        header = get_staged_table(get_statement_path(doc.staged_file))["metadata"].loc[doc.header_row]
+    else:
+        header = get_statement_row(path, doc.header_row)
+
+    colmap = {key: doc.get(field) for key, field in COLMAP_FIELDS.items()}
+    total = max(1, doc.txn_end_row - doc.txn_start_row)
+    stage_index = STAGE_NAMES.index("Insert")
+
+    # rows written before an interruption are skipped by their txn_hash
+    inserted_before = cint(doc.rows_inserted)
+    rows_before = 0
+
+    def on_batch(done, chunk_total, inserted):
+        doc.db_set("rows_inserted", inserted_before + inserted, update_modified=False)
+        publish_progress(doc, "Inserting", get_progress(stage_index, (rows_before + done) / total))
+
+    if doc.staged_file:
+        blocks = iter_staged_block(get_statement_path(doc.staged_file), header)
+    else:
+        blocks = iter_transaction_block(path, doc.txn_start_row, doc.txn_end_row, header)
+
+    # the sheet was read and digested in full, entries are only not built again for rows an
+    # overlapping statement already imported
+    imported = get_imported_ranges(doc)
+    rows_skipped = 0
+
+    for txn_data in blocks:
+        new_rows = drop_imported_rows(txn_data, imported)
+        rows_skipped += len(txn_data) - len(new_rows)
+        if not new_rows.empty:
+            inserted_before += create_transaction_entries(
+                new_rows, colmap, doc.account_number, on_batch=on_batch, date_format=doc.date_format
+            )
+        rows_before += len(txn_data)
+
+    count("rows.skipped_by_range", rows_skipped)
+    doc.db_set("rows_skipped", rows_skipped, update_modified=False)
+
+    # the chain is checked once from the earliest new entry, whatever order the chunks came in
+    verify_balance_chain(doc.account_number)
+
+def set_status(doc, status, stage_index):
+
+    doc.db_set("status", status, update_modified=False)
+    frappe.db.commit()
+    publish_progress(doc, status, get_progress(stage_index))
+
+def get_progress(stage_index, fraction=0.0):
+
+    return round((stage_index + fraction) / len(STAGES) * 100, 1)
+
+def publish_progress(doc, status, progress):
+
+    frappe.publish_realtime(
+        PROGRESS_EVENT,
+        {"statement_upload": doc.name, "status": status, "progress": progress},
+        doctype=doc.doctype,
+        docname=doc.name,
+    )
+
+# stage, status shown while it runs, and the function running it
+STAGES = [
+    ("Read", "Reading", read_stage),
+    ("Detect Table", "Detecting Table", detect_table_stage),
+    ("Stage Rows", "Staging Rows", stage_rows_stage),
+    ("Map Columns", "Mapping Columns", map_columns_stage),
+    ("Insert", "Inserting", insert_stage),
+]
+STAGE_NAMES = [stage for stage, _, _ in STAGES]
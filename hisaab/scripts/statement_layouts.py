@@ -0,0 +1,255 @@
+import itertools
+import re
+
+import frappe
+import numpy as np
+import pandas as pd
+from frappe.utils import now
+
+from hisaab.constants.constants import COLMAP_FIELDS
+from hisaab.constants.doctypes import DOCTYPES
+from hisaab.scripts.statement_file_handling import (
+    METADATA_ROWS,
+    SAMPLE_ROWS,
+    detect_transaction_table,
+    map_columns,
+    scan_statement,
+)
+from hisaab.scripts.transaction_entries import to_amount
+from hisaab.utils.column_types import classify_column, get_date_format
+from hisaab.utils.hashing import get_layout_fingerprint
+from hisaab.utils.patterns import find_info
+from hisaab.utils.profiling import count
+from hisaab.utils.readers import CHUNK_SIZE, iter_statement_chunks
+
+# a cached layout is only trusted if its columns reconcile the balance on this
+# share of rows, to within rounding
+LAYOUT_MIN_MATCH = 0.98
+BALANCE_TOLERANCE = 0.01
+
+IFSC = re.compile(r"\b([A-Z]{4})0[A-Z0-9]{6}\b")
+
+def match_statement_layout(path, chunk_size=CHUNK_SIZE):
+    """
+    Look for a cached Statement Layout matching one of the first rows of the statement.
+
+    Returns the table and colmap the way detect_transaction_table and map_columns
+    would, or None if no layout matches or its columns fail the balance check.
+    """
+    chunks = iter_statement_chunks(path, chunk_size)
+    first = next(chunks, None)
+    if first is None:
+        return None
+
+    head = first.iloc[:METADATA_ROWS]
+    candidates = {}
+    prefix = ""
+    for position, row in head.iterrows():
+        tokens = get_header_tokens(row)
+        if tokens:
+            candidates.setdefault(get_layout_fingerprint(tokens, prefix), position)
+        # the ifsc is read from the rows above a header
+        prefix = prefix or find_ifsc_prefix(row)
+
+    layouts = frappe.get_all(
+        DOCTYPES.get("Statement Layout"),
+        filters={"name": ["in", list(candidates)]},
+        fields=["name", "first_row_offset", "date_format", *COLMAP_FIELDS.values()],
+    )
+    if not layouts:
+        count("layout.miss")
+        return None
+
+    layout = min(layouts, key=lambda layout: candidates[layout.name])
+    header_row = candidates[layout.name]
+    header = head.loc[header_row]
+    colmap = {key: layout.get(field) for key, field in COLMAP_FIELDS.items()}
+    columns = get_column_positions(header, colmap)
+    if not columns:
+        return None
+
+    start = header_row + layout.first_row_offset
+    end, sample = find_block_end(itertools.chain([first], chunks), start, columns)
+    if not is_balance_consistent(sample, columns):
+        count("layout.rejected")
+        return None
+
+    count("layout.hit")
+
+    metadata = head[head.index < start]
+    info = find_info(metadata.to_string(index=False, header=False, na_rep=''))
+
+    table = {
+        "account_number": info.get("Account Number"),
+        "ifsc": info.get("IFSC Code"),
+        "start": int(start),
+        "end": int(end),
+        "metadata": metadata,
+        "sample": sample,
+    }
+
+    return {
+        "layout": layout.name,
+        "table": table,
+        "colmap": colmap,
+        "header_row": int(header_row),
+        "date_format": layout.date_format or get_date_format(sample[columns["transaction_date"]]),
+    }
+
+def map_statement(path, table=None):
+    """
+    The transaction table of the statement at `path` with its columns mapped, as
+    match_statement_layout returns it: a cached layout's mapping, or one inferred
+    from the table, with "layout" None. A `table` found earlier, e.g. read back
+    from the staged rows, is mapped without reading the statement.
+    """
+    if table is None:
+        layout = match_statement_layout(path)
+        if layout:
+            return layout
+        table = detect_transaction_table(scan_statement(path))
+
+    colmap, header_row = map_columns(table["sample"], table["metadata"])
+
+    return {
+        "layout": None,
+        "table": table,
+        "colmap": colmap,
+        "header_row": header_row,
+        # the date format is settled once here, every chunk is then read with it
+        "date_format": get_table_date_format(table, header_row, colmap),
+    }
+
+def store_statement_layout(mapped):
+    """Count a hit on the layout map_statement matched, or save the one it inferred. Returns the layout's name."""
+    if mapped["layout"]:
+        record_layout_hit(mapped["layout"])
+        return mapped["layout"]
+
+    return save_statement_layout(mapped["table"], mapped["colmap"], mapped["header_row"], mapped["date_format"])
+
+def record_layout_hit(layout):
+
+    doctype = DOCTYPES.get("Statement Layout")
+    hits = frappe.db.get_value(doctype, layout, "hits") or 0
+    frappe.db.set_value(doctype, layout, {"hits": hits + 1, "last_used": now()}, update_modified=False)
+
+def save_statement_layout(table, colmap, header_row, date_format=None):
+    """Store the layout inferred for a statement, returning the Statement Layout's name."""
+    metadata = table["metadata"]
+    prefix = ""
+    for _, row in metadata[metadata.index < header_row].iterrows():
+        prefix = find_ifsc_prefix(row)
+        if prefix:
+            break
+
+    tokens = get_header_tokens(metadata.loc[header_row])
+    fingerprint = get_layout_fingerprint(tokens, prefix)
+    values = {
+        "first_row_offset": table["start"] - header_row,
+        "date_format": date_format,
+        **{field: colmap.get(key) for key, field in COLMAP_FIELDS.items()},
+    }
+
+    doctype = DOCTYPES.get("Statement Layout")
+    if frappe.db.exists(doctype, fingerprint):
+        # the cached mapping failed its balance check, keep the new one
+        frappe.db.set_value(doctype, fingerprint, values)
+        return fingerprint
+
+    doc = frappe.get_doc({
+        "doctype": doctype,
+        "fingerprint": fingerprint,
+        "ifsc_prefix": prefix,
+        "column_count": len(tokens),
+        "header_tokens": "\n".join(tokens),
+        "last_used": now(),
+        **values,
+    })
+    doc.insert(ignore_permissions=True)
+
+    return doc.name
+
+def find_block_end(chunks, start, columns):
+    """
+    End of the transaction block starting at `start`: the first row whose date
+    column holds no date or whose amount columns are all blank. Returns the end
+    and the first SAMPLE_ROWS rows of the block.
+    """
+    sample = []
+    sampled = 0
+    end = start
+    for chunk in chunks:
+        if chunk.index[-1] < start:
+            continue
+
+        block = chunk.loc[max(start, chunk.index[0]):]
+        is_txn = classify_column(block[columns["transaction_date"]])[1].to_numpy()
+        has_amount = np.zeros(len(block), dtype=bool)
+        for key in ("debit_amount", "credit_amount", "remaining_balance"):
+            has_amount |= classify_column(block[columns[key]])[0].to_numpy()
+        is_txn = is_txn & has_amount
+
+        stop = len(is_txn) if is_txn.all() else int(is_txn.argmin())
+        if sampled < SAMPLE_ROWS:
+            sample.append(block.iloc[:min(stop, SAMPLE_ROWS - sampled)])
+            sampled += len(sample[-1])
+
+        end = int(block.index[0]) + stop
+        if stop < len(is_txn):
+            break
+
+    return end, pd.concat(sample) if sample else pd.DataFrame()
+
+def is_balance_consistent(sample, columns):
+    """
+    Cheap check of a cached layout: credit minus debit must reconcile the balance
+    change on nearly every row, read top down or bottom up.
+    """
+    if len(sample) < 4:
+        return False
+
+    credit, debit, balance = (
+        to_amount(sample[columns[key]]).fillna(0).to_numpy(dtype=float)
+        for key in ("credit_amount", "debit_amount", "remaining_balance")
+    )
+    flows = credit - debit
+    for deltas, flow in ((balance[1:] - balance[:-1], flows[1:]), (balance[:-1] - balance[1:], flows[:-1])):
+        if (np.abs(deltas - flow) <= BALANCE_TOLERANCE).mean() >= LAYOUT_MIN_MATCH:
+            return True
+
+    return False
+
+def get_table_date_format(table, header_row, colmap):
+    """The format of the sample's date column, see get_date_format."""
+    columns = get_column_positions(table["metadata"].loc[header_row], colmap)
+    if not columns:
+        return None
+
+    return get_date_format(table["sample"][columns["transaction_date"]])
+
+def get_column_positions(header, colmap):
+    """Sheet column holding each colmap header, or None if the header row lacks one."""
+    labels = [str(label) for label in header.tolist()]
+    if any(value not in labels for value in colmap.values()):
+        return None
+
+    return {key: header.index[labels.index(value)] for key, value in colmap.items()}
+
+def get_header_tokens(row):
+    """Cells of a header row as lowercase text, up to the last filled one."""
+    tokens = ["" if pd.isna(value) else str(value).strip().lower() for value in row.tolist()]
+    while tokens and not tokens[-1]:
+        tokens.pop()
+
+    return tokens
+
+def find_ifsc_prefix(row):
+    """Bank part of the first IFSC code in a row, or an empty string."""
+    for value in row.tolist():
+        if isinstance(value, str):
+            match = IFSC.search(value)
+            if match:
+                return match.group(1)
+
+    return ""
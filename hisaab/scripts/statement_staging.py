@@ -0,0 +1,191 @@
+import json
+import os
+
+import frappe
+import pandas as pd
+from frappe.utils import get_files_path
+
+from hisaab.scripts.statement_file_handling import SAMPLE_ROWS
+from hisaab.utils.hashing import is_blank
+from hisaab.utils.readers import CHUNK_SIZE, iter_statement_chunks
+
+# key of the schema metadata holding the block position and the rows around it
+STAGING_METADATA_KEY = b"hisaab"
+
+def stage_statement(doc, path, table, chunk_size=CHUNK_SIZE, on_block=None):
+    """
+    Attach the transaction block of the statement at `path` to `doc` as an Arrow
+    file, so mapping, previews and inserts can memory map it instead of reading the
+    sheet again. Returns the file url, or None if the block could not be staged,
+    the sheet is then read as before.
+
+    The block is written straight into the site's private files, the File record
+    only points at it, so no copy of it is held in memory.
+    """
+    file_name = f"{doc.name}-{frappe.generate_hash(length=8)}.arrow"
+    target = get_files_path(file_name, is_private=1)
+    if not write_staged_block(path, table, target, chunk_size, on_block):
+        frappe.logger("hisaab").info({"event": "statement_not_staged", "statement_upload": doc.name})
+        return None
+
+    file = frappe.get_doc({
+        "doctype": "File",
+        "file_name": file_name,
+        "file_url": f"/private/files/{file_name}",
+        "file_size": os.path.getsize(target),
+        "attached_to_doctype": doc.doctype,
+        "attached_to_name": doc.name,
+        "attached_to_field": "staged_file",
+        "is_private": 1,
+    })
+    file.insert(ignore_permissions=True)
+
+    return file.file_url
+
+def write_staged_block(path, table, target, chunk_size=CHUNK_SIZE, on_block=None):
+    """
+    Write rows [start, end) of the statement at `path` to `target` as an uncompressed
+    Arrow IPC file, with the rows around them in the schema metadata, one chunk at
+    a time. False, with nothing left at `target`, when a column does not keep the
+    type its sample had. `on_block(block)` sees each chunk of sheet rows before it
+    is written.
+    """
+    import pyarrow as pa
+
+    schema = get_staging_schema(table)
+    try:
+        with pa.OSFile(target, "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+            for block in iter_block(path, table, chunk_size):
+                if on_block:
+                    on_block(block)
+                writer.write_table(to_arrow_table(block, schema))
+    except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError, ValueError):
+        if os.path.exists(target):
+            os.remove(target)
+        return False
+
+    return True
+
+def iter_block(path, table, chunk_size=CHUNK_SIZE):
+    """Rows [start, end) of the sheet in chunks, with the columns of the rows around them."""
+    columns = table["metadata"].columns
+    for chunk in iter_statement_chunks(path, chunk_size):
+        if chunk.index[-1] >= table["start"]:
+            block = chunk.loc[max(table["start"], chunk.index[0]):table["end"] - 1]
+            if not block.empty:
+                yield block.reindex(columns=columns)
+
+        if chunk.index[-1] >= table["end"] - 1:
+            return
+
+def get_staging_schema(table):
+    """
+    One Arrow field per sheet column, typed from the scanned sample: numbers as
+    float64, dates as timestamps and anything else, mixed columns included, as text.
+    """
+    import pyarrow as pa
+
+    metadata = table["metadata"]
+    sample = table["sample"].reindex(columns=metadata.columns)
+
+    fields = []
+    for position, series in sample.items():
+        if pd.api.types.is_datetime64_any_dtype(series):
+            arrow_type = pa.timestamp("us")
+        elif pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            arrow_type = pa.float64()
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(str(position), arrow_type))
+
+    # cells around the block are kept as text, only header detection and account details
+    # read them. blanks stay None or NaN as the scan had them, headers are labelled by str()
+    staged = {
+        "start": table["start"],
+        "end": table["end"],
+        "account_number": table.get("account_number"),
+        "ifsc": table.get("ifsc"),
+        "columns": [int(position) for position in metadata.columns],
+        "index": [int(position) for position in metadata.index],
+        "rows": [[value if is_blank(value) else str(value) for value in row] for row in metadata.itertuples(index=False)],
+    }
+
+    return pa.schema(fields, metadata={STAGING_METADATA_KEY: json.dumps(staged)})
+
+def to_arrow_table(block, schema):
+
+    import pyarrow as pa
+
+    arrays = []
+    # iter_block reindexes every chunk to the metadata columns the schema has a field for
+    for field, (_, series) in zip(schema, block.items(), strict=True):
+        if pa.types.is_string(field.type):
+            values = series.astype(object).where(series.notna(), None)
+            values = values.map(lambda value: value if value is None or isinstance(value, str) else str(value))
+            arrays.append(pa.array(values, type=field.type))
+        else:
+            arrays.append(pa.array(series, type=field.type, from_pandas=True))
+
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+def open_staged_table(path):
+    """The staged Arrow table at `path`, memory mapped: nothing is read until a slice of it is converted."""
+    import pyarrow as pa
+
+    source = pa.memory_map(path, "r")
+
+    return pa.ipc.open_file(source).read_all()
+
+def get_staged_table(path):
+    """The staged block as detect_transaction_table returns it, for mapping columns without the sheet."""
+    staged = open_staged_table(path)
+    info = get_staged_info(staged)
+
+    return {
+        "account_number": info["account_number"],
+        "ifsc": info["ifsc"],
+        "start": info["start"],
+        "end": info["end"],
+        "metadata": get_staged_metadata(info),
+        "sample": to_frame(staged.slice(0, SAMPLE_ROWS), info["start"]),
+    }
+
+def get_staged_info(staged):
+
+    return json.loads(staged.schema.metadata[STAGING_METADATA_KEY])
+
+def get_staged_metadata(info):
+
+    return pd.DataFrame(info["rows"], index=info["index"], columns=info["columns"], dtype=object)
+
+def iter_staged_block(path, header, chunk_size=CHUNK_SIZE):
+    """The staged block in chunks labelled with the `header` row's cells as text, like iter_transaction_block."""
+    staged = open_staged_table(path)
+    start = get_staged_info(staged)["start"]
+    labels = [str(label) for label in header.tolist()]
+
+    for offset in range(0, staged.num_rows, chunk_size):
+        block = to_frame(staged.slice(offset, chunk_size), start + offset)
+        block = block.reindex(columns=header.index)
+        block.columns = labels
+        yield block
+
+def get_staged_rows(path, start=0, page_length=20):
+    """One page of the staged block as sheet rows, for previews."""
+    staged = open_staged_table(path)
+    info = get_staged_info(staged)
+    rows = to_frame(staged.slice(start, page_length), info["start"] + start)
+
+    return {
+        "rows": rows.astype(object).where(rows.notna(), None).values.tolist(),
+        "row_numbers": rows.index.tolist(),
+        "total": staged.num_rows,
+    }
+
+def to_frame(staged, position):
+
+    df = staged.to_pandas()
+    df.columns = [int(column) for column in df.columns]
+    df.index = pd.RangeIndex(position, position + len(df))
+
+    return df
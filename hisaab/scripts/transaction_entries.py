@@ -1,45 +1,138 @@
 import frappe
-from frappe.utils import getdate
+import pandas as pd
+from frappe.utils import now
+
 from hisaab.constants.doctypes import DOCTYPES
+from hisaab.scripts.ledger import apply_summary_deltas
+from hisaab.scripts.transactions import clear_aggregates_cache
+from hisaab.utils.categorization import categorize_entries
+from hisaab.utils.column_types import to_dates
+from hisaab.utils.hashing import hash_transaction_entries
+from hisaab.utils.profiling import count, span
+from hisaab.utils.queries import get_existing_hashes, get_stored_entries
+
+# rows written per multi-row insert, each batch is committed once
+BATCH_SIZE = 2000
+
+ENTRY_FIELDS = [
+    "transaction_date", "party", "debit_amount", "credit_amount", "remaining_balance",
+    "amount", "type", "status", "txn_hash", "subtype", "category_rule",
+]
 
-def create_transaction_entries(txn_data, colmap, account_number):
+def create_transaction_entries(txn_data, colmap, account_number, batch_size=BATCH_SIZE, on_batch=None, date_format=None):
 
+    entries = prepare_transaction_entries(txn_data, colmap, account_number, date_format)
+
+    return insert_transaction_entries(entries, account_number, batch_size, on_batch)
+
+def prepare_transaction_entries(txn_data, colmap, account_number, date_format=None):
+    """Transaction Entry rows of `txn_data` with their txn_hash and category, ready for insert_transaction_entries."""
     if txn_data.empty or not colmap:
         raise RuntimeError("Data is incomplete or empty.")
 
-    min_date = txn_data.iloc[-1][colmap.get("transaction_date")]
-    max_date = txn_data.iloc[0][colmap.get("transaction_date")]
+    with span("build_transaction_entries", rows=len(txn_data)):
+        entries = build_transaction_entries(txn_data, colmap, date_format)
+    with span("hash_transaction_entries", rows=len(entries)):
+        entries["txn_hash"] = hash_transaction_entries(entries, account_number)
 
-    existing_transactions = frappe.get_list(
-        doctype=DOCTYPES.get("Transaction Entry"),
-        filters={
-            "account": account_number,
-            "transaction_date": ["between", [getdate(min_date), getdate(max_date)]]
-        },
-        fields=["transaction_date", "credit_amount", "debit_amount", "party", "remaining_balance"]
-    )
+    # a row repeated within the sheet is still one transaction
+    entries = entries.drop_duplicates("txn_hash")
+    count("entries.repeated_in_sheet", len(txn_data) - len(entries))
 
-    existing_txn_hash = {
-        txn.get("party") for txn in existing_transactions
-    }
+    return entries.assign(**categorize_entries(entries))
 
-    # map columns to indices rather than names
+def build_transaction_entries(txn_data, colmap, date_format=None):
+    """
+    Map sheet columns to Transaction Entry fields and derive amount, type and status
+    for every row at once. Dates are read with `date_format`, or the format inferred
+    from the column when it is not known.
+    """
+    # map columns to positions rather than names, headers may repeat
     cols = list(txn_data.columns)
-    for key, value in colmap.items():
-        colmap[key] = cols.index(value)
-
-    for row in txn_data.itertuples(index=False, name=None):
-        if row[colmap.get("party")] not in existing_txn_hash:
-            data_dict = { col: row[index] for col, index in colmap.items() }
-            data_dict["transaction_date"] = getdate(data_dict["transaction_date"])
-            data_dict["type"] = "Expense" if (isinstance(data_dict.get("debit_amount"), str) and bool(data_dict.get("debit_amount").strip())) or bool(data_dict.get("debit_amount"))  else "Income"
-            doc = frappe.get_doc({
-                "doctype": DOCTYPES.get("Transaction Entry"),
-                "account": account_number,
-                **data_dict
-            })
-            doc.insert(ignore_permissions=True)
-        else:
-            break
-    
-    frappe.db.commit()
+    entries = pd.DataFrame({
+        field: txn_data.iloc[:, cols.index(col)].to_numpy() for field, col in colmap.items()
+    })
+
+    entries["transaction_date"] = to_dates(entries["transaction_date"], date_format)
+
+    for field in ("debit_amount", "credit_amount", "remaining_balance"):
+        entries[field] = to_amount(entries[field])
+
+    is_expense = entries["debit_amount"].fillna(0) > 0
+    entries["amount"] = entries["debit_amount"].where(is_expense, entries["credit_amount"]).fillna(0)
+    entries["type"] = is_expense.map({True: "Expense", False: "Income"})
+    entries["status"] = entries["type"]
+    entries["debit_amount"] = entries["debit_amount"].fillna(0)
+    entries["credit_amount"] = entries["credit_amount"].fillna(0)
+
+    return entries
+
+def to_amount(series):
+    """Coerce a column of sheet amounts, including strings like "1,234.50", to floats."""
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype(float)
+
+    cleaned = series.astype(object).where(series.notna(), None)
+    cleaned = cleaned.map(lambda value: value.replace(",", "").strip() if isinstance(value, str) else value)
+
+    return pd.to_numeric(cleaned, errors="coerce")
+
+def insert_transaction_entries(entries, account_number, batch_size=BATCH_SIZE, on_batch=None):
+    """
+    Write `entries` with multi-row inserts, committing once per batch. Rows whose
+    txn_hash is already stored are skipped and the account summaries are updated
+    with the rest, as are rows a concurrent import wrote between the lookup and
+    the insert. `on_batch(done, total, inserted)` is called before each batch
+    commits. Returns the number of rows written.
+    """
+    doctype = DOCTYPES.get("Transaction Entry")
+    fields = ["name", "creation", "modified", "owner", "modified_by", "docstatus", "idx", "account", *ENTRY_FIELDS]
+
+    timestamp = now()
+    user = frappe.session.user
+    rows = entries[ENTRY_FIELDS].astype(object).where(entries[ENTRY_FIELDS].notna(), None)
+
+    inserted = 0
+    for start in range(0, len(rows), batch_size):
+        batch = rows.iloc[start:start + batch_size]
+
+        # one lookup on the unique txn_hash index per batch
+        with span("db.existing_hashes", rows=len(batch)):
+            existing = get_existing_hashes(batch["txn_hash"].tolist())
+        batch = batch[~batch["txn_hash"].isin(existing)]
+        count("entries.already_stored", len(existing))
+
+        if not batch.empty:
+            values = [
+                (frappe.generate_hash(length=10), timestamp, timestamp, user, user, 0, 0, account_number, *row)
+                for row in batch.itertuples(index=False, name=None)
+            ]
+            # the unique index still guards against a concurrent import of the same rows
+            with span("db.insert", rows=len(values)):
+                frappe.db.bulk_insert(doctype, fields, values, ignore_duplicates=True, chunk_size=batch_size)
+
+            # rows a concurrent import wrote first were ignored, only the ones stored under
+            # the names given here are counted
+            with span("db.inserted_entries", rows=len(values)):
+                stored = get_stored_entries([value[0] for value in values])
+            txn_hash = fields.index("txn_hash")
+            written = [(value[0], value[txn_hash]) in stored for value in values]
+            batch = batch[written]
+            count("entries.written_concurrently", len(values) - len(batch))
+            inserted += len(batch)
+
+            # summaries move in the same transaction as the rows they count
+            with span("db.summaries", rows=len(batch)):
+                apply_summary_deltas(batch.assign(account=account_number))
+
+        # progress is recorded in the same transaction as the batch it counts
+        if on_batch:
+            on_batch(min(start + batch_size, len(rows)), len(rows), inserted)
+        with span("db.commit"):
+            frappe.db.commit()
+
+    # bulk inserts skip the document hooks that drop the cached aggregates
+    if inserted:
+        clear_aggregates_cache([account_number])
+
+    return inserted
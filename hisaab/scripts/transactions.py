@@ -0,0 +1,136 @@
+import json
+
+import frappe
+from frappe.utils import cint, flt, getdate
+
+from hisaab.constants.doctypes import DOCTYPES
+from hisaab.utils.profiling import count
+from hisaab.utils.queries import ENTRY_FIELDS, get_entries, get_permission_condition, get_range_totals
+
+AGGREGATES_CACHE_KEY = "hisaab:account_aggregates"
+
+# seconds an account's cached aggregates live, even if none of its entries change
+AGGREGATES_CACHE_TTL = 6 * 60 * 60
+
+# largest page a client can ask for
+MAX_PAGE_LENGTH = 1000
+
+@frappe.whitelist()
+def get_transactions(account, from_date=None, to_date=None, type=None, category=None, cursor=None, page_length=100):
+    """
+    One page of an account's entries by date, type and category, oldest first.
+    Pass the returned `next_cursor` back as `cursor` for the next page, it is None
+    on the last one. Only the entries frappe.get_list would show the user are paged.
+    """
+    doctype = DOCTYPES.get("Transaction Entry")
+    frappe.has_permission(doctype, "read", throw=True)
+    validate_account(account)
+
+    page_length = min(max(cint(page_length), 1), MAX_PAGE_LENGTH)
+    # one row past the page tells whether another page follows
+    entries = get_entries(
+        account, get_date(from_date), get_date(to_date), type or None, category or None,
+        fields=ENTRY_FIELDS, page_length=page_length + 1, after=decode_cursor(cursor),
+        condition=get_permission_condition(doctype),
+    )
+
+    return get_page(entries, page_length)
+
+def validate_account(account):
+
+    # entries are always read one account at a time, None would only find entries with no account
+    if not account:
+        frappe.throw(frappe._("Pass the account to read the entries of."))
+
+def get_page(entries, page_length):
+
+    if len(entries) <= page_length:
+        return {"entries": entries, "next_cursor": None}
+
+    entries = entries[:page_length]
+
+    return {"entries": entries, "next_cursor": encode_cursor(entries[-1])}
+
+def encode_cursor(entry):
+
+    return f"{getdate(entry['transaction_date'])}|{entry['name']}"
+
+def decode_cursor(cursor):
+
+    if not cursor:
+        return None
+
+    date, _, name = cursor.partition("|")
+    if not name:
+        raise RuntimeError(f"Invalid cursor {cursor}.")
+
+    return getdate(date), name
+
+@frappe.whitelist()
+def get_transaction_aggregates(account, from_date=None, to_date=None, type=None, category=None):
+    """
+    Entry count, debit and credit of the entries get_transactions pages through,
+    overall, by category and by type. Cached per account and permission condition,
+    so users who see different entries never share totals, until one of the
+    account's entries changes or AGGREGATES_CACHE_TTL passes.
+    """
+    doctype = DOCTYPES.get("Transaction Entry")
+    frappe.has_permission(doctype, "read", throw=True)
+    validate_account(account)
+    condition = get_permission_condition(doctype)
+
+    type, category = type or None, category or None
+    from_date, to_date = get_date(from_date), get_date(to_date)
+
+    cache = frappe.cache()
+    key = get_aggregates_key(account)
+    field = json.dumps([str(from_date or ""), str(to_date or ""), type, category, condition])
+    aggregates = cache.hget(key, field)
+    if aggregates is not None:
+        count("aggregates.hit")
+        return aggregates
+
+    count("aggregates.miss")
+    by_category = [
+        {"category": row.subtype, **get_totals([row])}
+        for row in get_range_totals(account, from_date, to_date, type, category, group_by="subtype", condition=condition)
+    ]
+    by_type = [
+        {"type": row.type, **get_totals([row])}
+        for row in get_range_totals(account, from_date, to_date, type, category, group_by="type", condition=condition)
+    ]
+    aggregates = {"totals": get_totals(by_type), "by_category": by_category, "by_type": by_type}
+    cache.hset(key, field, aggregates)
+    # hset sets no expiry, the whole hash is given one
+    cache.expire(cache.make_key(key), AGGREGATES_CACHE_TTL)
+
+    return aggregates
+
+def get_totals(rows):
+
+    return {
+        "entry_count": sum(cint(row["entry_count"]) for row in rows),
+        "total_debit": flt(sum(flt(row["total_debit"]) for row in rows)),
+        "total_credit": flt(sum(flt(row["total_credit"]) for row in rows)),
+    }
+
+def get_date(value):
+
+    return getdate(value) if value else None
+
+def get_aggregates_key(account):
+
+    return f"{AGGREGATES_CACHE_KEY}:{account or ''}"
+
+def clear_aggregates_cache(accounts):
+    """Drop the cached aggregates of `accounts`, every filter combination at once."""
+    for account in set(accounts):
+        frappe.cache().delete_value(get_aggregates_key(account))
+
+def on_entry_changed(doc, method=None):
+    """Drop the cached aggregates of the entry's accounts once the change is committed."""
+    before = doc.get_doc_before_save()
+    accounts = [doc.account, before.account if before else doc.account]
+
+    # cleared before the commit, a concurrent read could cache the old totals again
+    frappe.db.after_commit.add(lambda: clear_aggregates_cache(accounts))
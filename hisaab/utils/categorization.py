@@ -0,0 +1,227 @@
+import re
+
+import frappe
+
+from hisaab.constants.doctypes import DOCTYPES
+from hisaab.utils.profiling import count, traced
+
+RULES_CACHE_KEY = "hisaab:categorization_rules"
+
+# automaton compiled by this process and the rule version it was built from
+_COMPILED = {}
+
+# flags the combined rule regex is compiled with
+REGEX_FLAGS = re.IGNORECASE
+
+# (?i) and the like apply to a whole expression, they can't sit inside the combined one
+GLOBAL_FLAGS = re.compile(r"\(\?[aiLmsux]+\)")
+
+# \1 and the like, rule groups are renumbered once rules are combined
+NUMBERED_BACKREFERENCE = re.compile(r"(?<!\\)(?:\\\\)*\\[1-9]")
+
+def get_categorization_rules():
+    """
+    Enabled Categorization Rules in precedence order, with Party identifiers and
+    category types resolved, shared between workers through redis. Each rebuild
+    gets a new version.
+    """
+    cache = frappe.cache()
+    rules = cache.get_value(RULES_CACHE_KEY)
+    if rules is None:
+        rows = frappe.get_all(
+            DOCTYPES.get("Categorization Rule"),
+            filters={"enabled": 1},
+            fields=["name", "rule_type", "pattern", "party", "category", "priority"],
+            order_by="priority desc, creation asc",
+        )
+        identifiers = dict(frappe.get_all(
+            DOCTYPES.get("Party"),
+            filters={"name": ["in", [row.party for row in rows if row.party] or [""]]},
+            fields=["name", "identifier"],
+            as_list=True,
+        ))
+        category_types = dict(frappe.get_all(DOCTYPES.get("Transaction Category"), fields=["name", "type"], as_list=True))
+
+        compiled = []
+        for row in rows:
+            pattern = identifiers.get(row.party) if row.rule_type == "Party" else row.pattern
+            if not pattern or not pattern.strip():
+                continue
+            compiled.append({
+                "name": row.name,
+                "rule_type": row.rule_type,
+                "pattern": pattern.strip() if row.rule_type == "Regex" else pattern.strip().lower(),
+                "category": row.category,
+                "category_type": category_types.get(row.category),
+            })
+
+        rules = {"version": frappe.generate_hash(length=10), "rules": compiled}
+        cache.set_value(RULES_CACHE_KEY, rules)
+
+    return rules
+
+def get_categorizer():
+    """The rules compiled into one automaton, recompiled only when the rule version changes."""
+    rules = get_categorization_rules()
+    if _COMPILED.get("version") != rules["version"]:
+        count("categorizer.miss")
+        _COMPILED.clear()
+        _COMPILED.update(compile_rules(rules["rules"]), version=rules["version"])
+    else:
+        count("categorizer.hit")
+
+    return _COMPILED
+
+def compile_rules(rules):
+    """
+    Compile substring and Party rules into a single trie shaped regex, whose cost
+    per character does not grow with the number of rules, and regex rules into
+    one alternation tried in precedence order.
+    """
+    literals = {}
+    regex_groups = {}
+    for rank, rule in enumerate(rules):
+        rule = {**rule, "rank": rank}
+        if rule["rule_type"] != "Regex":
+            literals.setdefault(rule["pattern"], []).append(rule)
+            continue
+
+        error = get_regex_rule_error(rule["pattern"])
+        if error:
+            # a rule saved before validation caught it must not fail every insert
+            frappe.logger("hisaab").warning({"event": "categorization_rule_skipped", "rule": rule["name"], "error": error})
+            continue
+
+        # at each position only the first matching alternative is reported, grouping
+        # by category type leaves it the only one categorize could pick there
+        regex_groups.setdefault(rule["category_type"], []).append(rule)
+
+    # a lookahead finds a match at every position, so overlapping literals all count
+    literal_regex = re.compile(f"(?=({get_trie_pattern(literals)}))") if literals else None
+
+    return {
+        "rules": rules,
+        "literals": literals,
+        "lengths": sorted({len(literal) for literal in literals}),
+        "literal_regex": literal_regex,
+        "regex_groups": [
+            {"regex": re.compile(get_combined_regex([rule["pattern"] for rule in group]), REGEX_FLAGS), "rules": group}
+            for group in regex_groups.values()
+        ],
+    }
+
+def get_combined_regex(patterns):
+    """One lookahead trying `patterns` in order at every position, each in a named group telling which matched."""
+    alternatives = "|".join(f"(?P<r{index}>{pattern})" for index, pattern in enumerate(patterns))
+
+    return f"(?=(?:{alternatives}))"
+
+def get_regex_rule_error(pattern):
+    """Why `pattern` can't be a Regex rule, or None. It is compiled the way compile_rules combines it."""
+    if GLOBAL_FLAGS.search(pattern):
+        return "Inline global flags like (?i) are not allowed, use a scoped group like (?i:...) instead."
+    if NUMBERED_BACKREFERENCE.search(pattern):
+        return "Numbered backreferences like \\1 are not allowed in rule patterns."
+
+    try:
+        compiled = re.compile(pattern, REGEX_FLAGS)
+        re.compile(get_combined_regex([pattern]), REGEX_FLAGS)
+    except re.error as e:
+        return f"Invalid regular expression: {e}"
+
+    if compiled.groupindex:
+        return "Named groups are not allowed in rule patterns."
+
+    return None
+
+def get_trie_pattern(literals):
+    """Regex matching the longest of `literals` starting at a position, with shared prefixes factored out."""
+    trie = {}
+    for literal in literals:
+        node = trie
+        for char in literal:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    return to_pattern(trie)
+
+def to_pattern(node):
+
+    branches = [re.escape(char) + to_pattern(child) for char, child in sorted(node.items()) if char]
+    if not branches:
+        return ""
+
+    # every branch starts with a different character, so at most one is ever tried past it
+    pattern = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    if "" in node:
+        return f"(?:{pattern})?"
+
+    return pattern
+
+def find_matching_rules(text, categorizer):
+    """
+    Every rule matching `text`, in precedence order. A regex rule matching at
+    the same position as an earlier rule of its category type is left out, it
+    could never be the rule categorize picks.
+    """
+    if not isinstance(text, str) or not text:
+        return []
+
+    matched = {}
+    if categorizer["literal_regex"]:
+        literals = categorizer["literals"]
+        for match in categorizer["literal_regex"].finditer(text.lower()):
+            found = match.group(1)
+            # the trie returns the longest literal, shorter ones sharing its start count too
+            for length in categorizer["lengths"]:
+                if length > len(found):
+                    break
+                for rule in literals.get(found[:length], []):
+                    matched[rule["rank"]] = rule
+
+    for group in categorizer["regex_groups"]:
+        for match in group["regex"].finditer(text):
+            rule = group["rules"][int(match.lastgroup[1:])]
+            matched[rule["rank"]] = rule
+
+    return [matched[rank] for rank in sorted(matched)]
+
+def categorize(text, entry_type=None, categorizer=None):
+    """The first rule matching `text` whose category suits `entry_type`, or None."""
+    categorizer = categorizer or get_categorizer()
+    for rule in find_matching_rules(text, categorizer):
+        if not entry_type or not rule["category_type"] or rule["category_type"] == entry_type:
+            return rule
+
+    return None
+
+@traced("categorize_entries")
+def categorize_entries(entries):
+    """
+    Category and rule of every row of `entries` (party and type columns), as a
+    frame aligned with it. Each distinct party and type is categorized once.
+    """
+    import pandas as pd
+
+    categorizer = get_categorizer()
+    result = pd.DataFrame({"subtype": None, "category_rule": None}, index=entries.index, dtype=object)
+    if not categorizer["rules"]:
+        return result
+
+    types = entries["type"] if "type" in entries else pd.Series(None, index=entries.index, dtype=object)
+    keys = pd.MultiIndex.from_arrays([entries["party"], types])
+
+    rules = {}
+    for text, entry_type in keys.unique():
+        rules[(text, entry_type)] = categorize(text, entry_type, categorizer)
+    count("categorize.distinct_parties", len(rules))
+
+    matched = [rules[key] for key in keys]
+    result["subtype"] = [rule["category"] if rule else None for rule in matched]
+    result["category_rule"] = [rule["name"] if rule else None for rule in matched]
+
+    return result
+
+def clear_categorization_cache(doc=None, method=None):
+
+    frappe.cache().delete_value(RULES_CACHE_KEY)
@@ -0,0 +1,276 @@
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from dateutil.parser import parserinfo
+from frappe.utils import getdate
+from pandas.api.types import is_bool_dtype, is_complex_dtype, is_datetime64_any_dtype, is_numeric_dtype
+
+from hisaab.utils.parsing import has_atleast_one_letter_and_digit, is_int_or_float, is_valid_locale_date
+from hisaab.utils.profiling import count, span
+
+# strptime formats tried when inferring a date column, day first formats come
+# before their month first twins so ambiguous columns resolve to them
+DATE_FORMATS = [
+    "%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y", "%d/%m/%y", "%d-%m-%y", "%d.%m.%y",
+    "%d-%b-%Y", "%d-%b-%y", "%d %b %Y", "%d %b %y", "%d/%b/%Y", "%d/%b/%y",
+    "%d %B %Y", "%d-%B-%Y", "%B %d, %Y", "%b %d, %Y",
+    "%Y-%m-%d", "%Y/%m/%d",
+    "%m/%d/%Y", "%m-%d-%Y", "%m/%d/%y", "%m-%d-%y",
+    "%d/%m/%Y %H:%M:%S", "%d/%m/%Y %H:%M", "%d-%m-%Y %H:%M:%S", "%d-%m-%Y %H:%M",
+    "%Y-%m-%d %H:%M:%S", "%d %b %Y %H:%M", "%d-%b-%Y %H:%M:%S",
+]
+
+DATE_SAMPLE_SIZE = 200
+
+# share of a column's distinct date strings its format must parse to be kept
+DATE_FORMAT_MIN_MATCH = 0.9
+
+# strings pd.to_numeric reads differently from float(): underscores, nan/inf
+# spellings and exponents that overflow
+FLOAT_EDGE_CASES = re.compile(r"_|nan|inf|e[+-]?\d{3}", re.IGNORECASE)
+NON_ASCII = re.compile(r"[^\x00-\x7f]")
+WORD = re.compile(r"[A-Za-z]+")
+DIGIT = re.compile(r"[0-9]")
+LETTER_AND_DIGIT = re.compile(r"(?=.*[A-Za-z])(?=.*[0-9])", re.DOTALL)
+
+# every word dateutil understands, a word outside this set (that can't be a
+# timezone abbreviation) makes parse(fuzzy=False) fail
+DATE_WORDS = {
+    word.lower()
+    for group in (
+        parserinfo.JUMP, parserinfo.WEEKDAYS, parserinfo.MONTHS, parserinfo.HMS,
+        parserinfo.AMPM, parserinfo.UTCZONE, parserinfo.PERTAIN,
+    )
+    for entry in group
+    for word in (entry if isinstance(entry, tuple) else (entry,))
+}
+
+def classify_frame(df):
+    """
+    Return the numeric, date and alphanumeric masks of `df` in a single pass over its columns.
+
+    The masks match `df.applymap` with is_int_or_float, is_valid_locale_date
+    and has_atleast_one_letter_and_digit, without calling them per cell.
+    """
+    numeric, dates, alnum = [], [], []
+    with span("classify_frame", rows=len(df)):
+        for _, series in df.items():
+            num_col, date_col, alnum_col = classify_column(series)
+            numeric.append(num_col)
+            dates.append(date_col)
+            alnum.append(alnum_col)
+
+    masks = {}
+    for key, cols in (("numeric", numeric), ("date", dates), ("alnum", alnum)):
+        mask = pd.concat(cols, axis=1) if cols else pd.DataFrame(index=df.index)
+        mask.columns = df.columns
+        masks[key] = mask
+
+    return masks
+
+def get_transaction_rows(masks):
+    """Rows that look like a transaction: two numbers, a date and an alphanumeric cell."""
+    return (masks["numeric"].sum(axis=1) >= 2) & masks["date"].any(axis=1) & masks["alnum"].any(axis=1)
+
+def classify_column(series):
+
+    size = len(series)
+    notna = series.notna().to_numpy()
+    false = np.zeros(size, dtype=bool)
+
+    if is_complex_dtype(series):
+        return to_mask(false, series), to_mask(false, series), to_mask(false, series)
+    if is_bool_dtype(series) or is_numeric_dtype(series):
+        return to_mask(notna, series), to_mask(false, series), to_mask(false, series)
+    if is_datetime64_any_dtype(series):
+        return to_mask(false, series), to_mask(notna, series), to_mask(false, series)
+
+    values = pd.Series(series.to_numpy(dtype=object))
+    inferred = pd.api.types.infer_dtype(values, skipna=True)
+    if inferred == "string":
+        is_str = notna
+    elif inferred in ("empty", "integer", "floating", "mixed-integer-float", "decimal", "boolean", "datetime", "date"):
+        is_str = false
+    else:
+        is_str = np.fromiter((isinstance(value, str) for value in values), dtype=bool, count=size)
+
+    numeric, dates, alnum = false.copy(), false.copy(), false.copy()
+
+    # non string cells never need parsing, the predicates are cheap for them
+    others = np.flatnonzero(notna & ~is_str)
+    if len(others):
+        numeric[others] = [is_int_or_float(value) for value in values.iloc[others]]
+        dates[others] = [is_valid_locale_date(value) for value in values.iloc[others]]
+
+    strings = np.flatnonzero(is_str)
+    if len(strings):
+        text = values.iloc[strings].astype(str)
+        non_ascii = text.str.contains(NON_ASCII).to_numpy(dtype=bool)
+
+        fallback = strings[non_ascii]
+        if len(fallback):
+            numeric[fallback] = [is_int_or_float(value) for value in values.iloc[fallback]]
+            dates[fallback] = [is_valid_locale_date(value) for value in values.iloc[fallback]]
+            alnum[fallback] = [has_atleast_one_letter_and_digit(value) for value in values.iloc[fallback]]
+
+        text = text[~non_ascii]
+        ascii_strings = strings[~non_ascii]
+        if len(ascii_strings):
+            coerced = pd.to_numeric(text, errors="coerce")
+            is_num = text.str.isdigit().to_numpy(dtype=bool) | (coerced.notna() & coerced.ne(0)).to_numpy()
+            edge_cases = text.str.contains(FLOAT_EDGE_CASES).to_numpy(dtype=bool)
+            if edge_cases.any():
+                is_num[edge_cases] = [is_int_or_float(value) for value in text[edge_cases]]
+
+            numeric[ascii_strings] = is_num
+            alnum[ascii_strings] = text.str.match(LETTER_AND_DIGIT).to_numpy(dtype=bool)
+
+            if not is_num.all():
+                dates[ascii_strings[~is_num]] = find_dates(text[~is_num])
+
+    return to_mask(numeric, series), to_mask(dates, series), to_mask(alnum, series)
+
+def to_mask(values, series):
+
+    return pd.Series(values, index=series.index, dtype=bool)
+
+def find_dates(strings):
+    """Mask of `strings` dateutil can parse, converting the column in bulk with its inferred format."""
+    unique = pd.Index(strings.unique())
+    parsed = pd.Series(False, index=unique)
+
+    date_format = infer_date_format(unique)
+    if date_format:
+        # pandas reads "now" and "today" whatever the format, dateutil does not
+        parsed[:] = pd.to_datetime(unique, format=date_format, errors="coerce").notna() & ~unique.str.lower().isin(
+            ["now", "today"]
+        )
+
+    misses = unique[~parsed.values]
+    if len(misses):
+        parsed.loc[misses] = [is_dateutil_date(value) for value in misses]
+
+    return strings.isin(parsed.index[parsed.values]).to_numpy(dtype=bool)
+
+def infer_date_format(values):
+    """Pick the strptime format parsing most of a sample of `values`, or None."""
+    sample = list(values[:DATE_SAMPLE_SIZE])
+
+    candidates = []
+    for shape in {get_value_shape(value) for value in sample}:
+        candidates.extend(fmt for fmt in get_shape_formats(shape) if fmt not in candidates)
+    if not candidates:
+        return None
+
+    best, best_hits = None, 0
+    for fmt in DATE_FORMATS:
+        if fmt not in candidates:
+            continue
+        hits = int(pd.to_datetime(sample, format=fmt, errors="coerce").notna().sum())
+        if hits > best_hits:
+            best, best_hits = fmt, hits
+
+    return best
+
+def get_date_format(series):
+    """
+    The strptime format of the date strings in `series`, inferred from a sample and
+    kept only if it parses DATE_FORMAT_MIN_MATCH of the column. Ambiguous columns
+    (no day above 12) resolve day first, as Indian banks write them.
+    """
+    strings = get_date_strings(series)
+    if not len(strings):
+        return None
+
+    date_format = infer_date_format(strings)
+    if not date_format:
+        return None
+
+    parsed = pd.to_datetime(strings, format=date_format, errors="coerce").notna().mean()
+
+    return date_format if parsed >= DATE_FORMAT_MIN_MATCH else None
+
+def to_dates(series, date_format=None):
+    """
+    Dates of a statement column as datetime.date, converting its strings in bulk with
+    `date_format` (inferred from the column when not given). Cells the format does
+    not fit, and dates the reader already parsed, are converted one by one, day first.
+    """
+    values = pd.Series(series.to_numpy(dtype=object), index=series.index)
+    date_format = date_format or get_date_format(values)
+
+    # a statement only has a few thousand distinct dates, each is read once
+    keys = {value: get_date_key(value) for value in values.dropna().unique()}
+    strings = pd.Index(list(dict.fromkeys(key for key in keys.values() if isinstance(key, str))), dtype=object)
+
+    dates = {}
+    if date_format and len(strings):
+        # errors="coerce" gives NaT for a string the format does not fit, one value per string
+        converted = pd.to_datetime(strings, format=date_format, errors="coerce")
+        dates = {value: timestamp.date() for value, timestamp in zip(strings, converted, strict=True) if not pd.isna(timestamp)}
+
+    misses = [key for key in dict.fromkeys(keys.values()) if key is not None and key not in dates]
+    count("dates.parsed_per_cell", len(misses))
+    for key in misses:
+        dates[key] = getdate(key, parse_day_first=True)
+
+    result = values.map({value: dates.get(key) for value, key in keys.items()})
+
+    return result.astype(object).where(result.notna(), None)
+
+def get_date_strings(series):
+    """Distinct non blank strings of `series`, stripped, in the order they appear."""
+    keys = (get_date_key(value) for value in series.dropna().unique())
+
+    return pd.Index(list(dict.fromkeys(key for key in keys if isinstance(key, str))), dtype=object)
+
+def get_date_key(value):
+
+    # blank cells have no date, frappe's getdate would read them as today
+    if isinstance(value, str):
+        return value.strip() or None
+    if pd.isna(value):
+        return None
+
+    return value
+
+def get_value_shape(value):
+
+    return re.sub(r"[A-Za-z]", "a", re.sub(r"\d", "0", str(value).strip()))
+
+@lru_cache(maxsize=1024)
+def get_shape_formats(shape):
+
+    return tuple(fmt for fmt, pattern in FORMAT_SHAPES.items() if pattern.fullmatch(shape))
+
+def get_format_shape(fmt):
+
+    directives = {
+        "%d": r"0{1,2}", "%m": r"0{1,2}", "%y": r"00", "%Y": r"0000",
+        "%H": r"0{1,2}", "%M": r"00", "%S": r"00", "%b": r"a{3}", "%B": r"a{3,9}",
+    }
+    pattern = ""
+    for token in re.split(r"(%[a-zA-Z])", fmt):
+        pattern += directives.get(token, re.escape(token))
+
+    return re.compile(pattern)
+
+FORMAT_SHAPES = {fmt: get_format_shape(fmt) for fmt in DATE_FORMATS}
+
+@lru_cache(maxsize=65536)
+def is_dateutil_date(value):
+
+    # cheap exact rejection: with fuzzy=False dateutil fails on a word it does
+    # not know unless it can be a timezone, which needs a time parsed before it
+    first_digit = DIGIT.search(value)
+    for word in WORD.finditer(value):
+        if word.group().lower() in DATE_WORDS:
+            continue
+        if not (len(word.group()) <= 5 and word.group().isupper()):
+            return False
+        if not first_digit or word.start() < first_digit.start():
+            return False
+
+    return is_valid_locale_date(value)
@@ -0,0 +1,88 @@
+import hashlib
+import math
+import numbers
+
+from frappe.utils import flt, getdate
+
+
+def get_transaction_hash(account, transaction_date, credit_amount, debit_amount, remaining_balance, party):
+    """Fingerprint of a statement row, identical rows in overlapping statements share it."""
+    key = "|".join([
+        str(account or ""),
+        str(getdate(transaction_date)),
+        f"{flt(credit_amount):.2f}",
+        f"{flt(debit_amount):.2f}",
+        "" if is_blank(remaining_balance) else f"{flt(remaining_balance):.2f}",
+        # a narration the reader left as NaN or a number hashes as hash_transaction_entries reads it
+        "" if is_blank(party) else str(party).strip(),
+    ])
+
+    return hashlib.sha1(key.encode()).hexdigest()
+
+def hash_transaction_entries(entries, account):
+    """Vectorized get_transaction_hash over a frame of Transaction Entry fields."""
+    import numpy as np
+    import pandas as pd
+
+    def amounts(series):
+        values = pd.to_numeric(series, errors="coerce").to_numpy(dtype=float)
+        return pd.Series(np.char.mod("%.2f", np.nan_to_num(values)), index=series.index)
+
+    balance = amounts(entries["remaining_balance"]).where(entries["remaining_balance"].notna(), "")
+    party = entries["party"].where(entries["party"].notna(), "").astype(str).str.strip()
+
+    keys = (
+        str(account or "") + "|"
+        + entries["transaction_date"].astype(str) + "|"
+        + amounts(entries["credit_amount"]) + "|"
+        + amounts(entries["debit_amount"]) + "|"
+        + balance + "|"
+        + party
+    )
+
+    return keys.map(lambda key: hashlib.sha1(key.encode()).hexdigest())
+
+def is_blank(value):
+
+    # pd.isna for the scalars a document field can hold, without importing pandas
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+def get_file_digest(path, block_size=1 << 20):
+    """sha256 of the file at `path`, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+def get_row_digests(frame):
+    """sha1 of each row's cells as text, numbers written the same whether the reader gave an int or a float."""
+    return [
+        hashlib.sha1("\x1f".join(map(get_cell_text, row)).encode()).hexdigest()
+        for row in frame.itertuples(index=False, name=None)
+    ]
+
+def get_cell_text(value):
+
+    if isinstance(value, str):
+        return value.strip()
+    # NaT, like NaN, is the only value not equal to itself
+    if is_blank(value) or value != value:
+        return ""
+    if isinstance(value, numbers.Number) and not isinstance(value, bool):
+        return repr(float(value))
+
+    return str(value)
+
+def get_layout_fingerprint(header_tokens, ifsc_prefix):
+    """Fingerprint of a statement layout, statements exported by the same bank in the same format share it."""
+    key = "|".join([ifsc_prefix or "", str(len(header_tokens)), *header_tokens])
+
+    return hashlib.sha1(key.encode()).hexdigest()
+
+def get_summary_name(account, month, category):
+    """Name of the Transaction Summary row of an account, month and category."""
+    key = "|".join([account or "", str(month), category or ""])
+
+    return hashlib.sha1(key.encode()).hexdigest()[:20]
@@ -0,0 +1,137 @@
+import os
+import time
+from collections import OrderedDict
+
+import frappe
+import psutil
+
+from hisaab.utils.profiling import count, span
+
+DEFAULT_MODEL = "en_core_web_lg"
+
+# model and pipeline components each call site relies on. the matcher only
+# reads lexical token attributes and similarity only reads the static word
+# vectors, so neither needs any of the trained components.
+TASKS = {
+    "matcher": {"model": DEFAULT_MODEL, "components": []},
+    "similarity": {"model": DEFAULT_MODEL, "components": []},
+}
+
+# loaded models and their load statistics, kept for the life of the process
+_MODELS = {}
+MODEL_STATS = {}
+
+# Docs of short texts per task, least recently used first. the same bank's
+# headers and the Header Alias synonyms come back with every statement
+DOC_CACHE_SIZE = 5000
+DOC_CACHE_MAX_CHARS = 200
+_DOCS = OrderedDict()
+
+def get_nlp(task="similarity"):
+
+    if task not in TASKS:
+        raise RuntimeError(f"Unknown NLP task {task}, must be one among {list(TASKS)}")
+
+    model = TASKS[task]["model"]
+    nlp = _MODELS.get(model)
+    if nlp is None:
+        count("nlp.model_miss")
+        nlp = _MODELS[model] = load_model(model)
+        # cached Docs belong to the vocab of the model they were made with
+        _DOCS.clear()
+    else:
+        count("nlp.model_hit")
+
+    return nlp
+
+def make_doc(text, task="similarity"):
+
+    return make_docs([text], task)[0]
+
+def make_docs(texts, task="similarity", batch_size=256, n_process=1):
+    """
+    A Doc for each of `texts`, in order. Short texts seen before come from the
+    Doc cache, the rest go through nlp.pipe in batches of `batch_size` (over
+    `n_process` processes) with only the task's components enabled.
+    """
+    nlp = get_nlp(task)
+    texts = list(texts)
+
+    docs = {}
+    for text in texts:
+        if (task, text) in _DOCS:
+            _DOCS.move_to_end((task, text))
+            docs[text] = _DOCS[(task, text)]
+    missing = list(dict.fromkeys(text for text in texts if text not in docs))
+    count("nlp.doc_hit", len(texts) - len(missing))
+
+    if missing:
+        count("nlp.doc_miss", len(missing))
+        with span("nlp.pipe", rows=len(missing)), nlp.select_pipes(enable=TASKS[task]["components"]):
+            # pipe yields one Doc per text, in order
+            docs.update(zip(missing, nlp.pipe(missing, batch_size=batch_size, n_process=n_process), strict=True))
+        for text in missing:
+            cache_doc(task, text, docs[text])
+
+    return [docs[text] for text in texts]
+
+def cache_doc(task, text, doc):
+
+    # sheet metadata and other long texts rarely repeat
+    if len(text) > DOC_CACHE_MAX_CHARS:
+        return
+
+    _DOCS[(task, text)] = doc
+    while len(_DOCS) > DOC_CACHE_SIZE:
+        _DOCS.popitem(last=False)
+
+def load_model(model):
+    """Load a spaCy model excluding every component no task asks for, and record load time and memory."""
+    needed = {
+        component for task in TASKS.values() if task["model"] == model for component in task["components"]
+    }
+    exclude = [component for component in get_model_pipeline(model) if component not in needed]
+
+    # spacy takes seconds to import, only processes parsing a statement pay for it
+    import spacy
+
+    rss_before = get_rss_mb()
+    start = time.perf_counter()
+    with span("nlp.load"):
+        nlp = spacy.load(model, exclude=exclude)
+    load_seconds = time.perf_counter() - start
+
+    MODEL_STATS[model] = {
+        "load_seconds": round(load_seconds, 3),
+        "rss_delta_mb": round(get_rss_mb() - rss_before, 1),
+        "components": list(nlp.pipe_names),
+        "excluded": exclude,
+        "pid": os.getpid(),
+    }
+    frappe.logger("hisaab").info({"event": "spacy_model_loaded", "model": model, **MODEL_STATS[model]})
+
+    return nlp
+
+def get_model_pipeline(model):
+
+    import spacy
+
+    try:
+        meta = spacy.util.get_model_meta(spacy.util.get_package_path(model))
+    except Exception:
+        # not an installed package (e.g. a path), load everything
+        return []
+
+    return meta.get("pipeline", [])
+
+def get_rss_mb():
+
+    return psutil.Process(os.getpid()).memory_info().rss / (1024 * 1024)
+
+def warm_up(force=False):
+    """Load every task model ahead of the first upload when `hisaab_preload_nlp_models` is set in site config."""
+    if not (force or frappe.conf.get("hisaab_preload_nlp_models")):
+        return
+
+    for task in TASKS:
+        get_nlp(task)
@@ -1,55 +1,38 @@
-import frappe
-import spacy
 import json
-import pandas as pd
-import numpy as np
-from spacy.matcher import Matcher
 from datetime import datetime
-from dateutil.parser import parse
-from hisaab.constants.doctypes import DOCTYPES
 
-def find_info_in_text(look_for, text=None, spacy_doc=None, nlp=None):
+import frappe
+import numpy as np
+import pandas as pd
+from dateutil.parser import parse
 
-    valid_types = frappe.get_meta(
-        DOCTYPES.get("Pattern Definition"), cached=True
-        ).get_field("for").options.split('\n')
-    
-    if not look_for in valid_types:
-        raise RuntimeError(f"ANParser must look for one among {valid_types}")
-    
-    if not text and not spacy_doc:
-        raise RuntimeError("ANParser called without arguements.")
+from hisaab.constants.doctypes import DOCTYPES
+from hisaab.utils.nlp import make_docs
+from hisaab.utils.patterns import find_all_info, find_info, get_lookup_targets
 
-    if not spacy_doc:
-        nlp = spacy.load("en_core_web_sm")
-        spacy_doc = nlp(text)
-    
-    matcher = Matcher(nlp.vocab)
 
-    # get match patterns stored in dt
-    patterns = frappe.get_list(
-        DOCTYPES.get("Pattern Definition"),
-        {"for":look_for, "type": "spaCy"},
-        pluck="pattern"
-    )
+def find_info_in_text(look_for, text=None, spacy_doc=None):
 
-    patterns = [ json.loads(pattern) for pattern in patterns ]
+    valid_types = get_lookup_targets()
 
-    # find account numbers by matching loaded patterns
-    matcher.add(look_for, patterns)
+    if look_for not in valid_types:
+        raise RuntimeError(f"ANParser must look for one among {valid_types}")
 
-    matches = matcher(spacy_doc)
+    if not text and not spacy_doc:
+        raise RuntimeError("ANParser called without arguements.")
 
-    matches = [ spacy_doc[start:end][-1].text for match_id, start, end in matches ]
+    if spacy_doc:
+        # patterns for every target are compiled into one cached matcher
+        return find_all_info(spacy_doc).get(look_for)
 
-    return matches[0] if matches else None
+    return find_info(text).get(look_for)
 
 def is_int_or_float(arg):
 
     return pd.notna(arg) and (isinstance(arg, int) or isinstance(arg, float) or (isinstance(arg, str) and (arg.isdigit() or is_float(arg))))
 
 def has_atleast_one_letter_and_digit(arg):
-    
+
     return isinstance(arg, str) and (any(char.isalpha() for char in arg) and any(char.isdigit() for char in arg))
 
 def is_float(value):
@@ -57,7 +40,7 @@ def is_float(value):
     try:
         if isinstance(value, str) and float(value):
             return True
-    except Exception as e:
+    except Exception:
         return False
 
 def is_valid_locale_date(value):
@@ -77,15 +60,13 @@ def is_valid_locale_date(value):
 
 def evaluate_combo(df, credit_col, debit_col, balance_col):
     """Return metrics evaluating how well credit/debit explain balance changes."""
-    if not balance_col == 'Unnamed: 6':
-        return None
     C = pd.to_numeric(df[credit_col], errors='coerce').values
     C[np.isnan(C)] = 0
     D = pd.to_numeric(df[debit_col], errors='coerce').values
     D[np.isnan(D)] = 0
     B = pd.to_numeric(df[balance_col], errors='coerce').values
     B[np.isnan(B)] = 0
-    
+
     results = []
     for orientation in ("forward", "reverse"):
         if orientation == "reverse":
@@ -110,7 +91,7 @@ def evaluate_combo(df, credit_col, debit_col, balance_col):
 
         residuals = dB_m - flow_m
         rmse = float(np.sqrt(np.nanmean(residuals**2)))
-        
+
         mean_abs_B = np.nanmean(np.abs(Bx))
         scale = max(1.0, mean_abs_B)
         normalized_rmse = rmse / scale
@@ -128,39 +109,38 @@ def evaluate_combo(df, credit_col, debit_col, balance_col):
     # return best result (if any)
     if not results:
         return None
-    
+
     best = sorted(results, key=lambda x: x["score"], reverse=True)[0]
     return best
 
-def find_spacy_similarity(string, matcher, nlp=None):
+def find_spacy_similarity(string, matcher):
 
-    if not nlp:
-        nlp = spacy.load("en_core_web_lg")
-    
-    return nlp(string.lower()).similarity(nlp(matcher.lower()))
+    first, second = make_docs([string.lower(), matcher.lower()], "similarity")
 
-def find_best_candidate(candidates, matcher_list, nlp=None):
+    return first.similarity(second)
+
+def find_best_candidate(candidates, matcher_list):
+
+    # every string goes through the pipeline once, in one batch
+    texts = [str(text).lower() for text in [*candidates, *matcher_list]]
+    docs = dict(zip(texts, make_docs(texts, "similarity"), strict=True))
 
-    if not nlp:
-        nlp = spacy.load("en_core_web_lg")
-    
     scores = []
 
     for candidate in candidates:
         score = 0
         for syn in matcher_list:
-            sim_score = find_spacy_similarity(candidate, syn, nlp)
+            sim_score = docs[str(candidate).lower()].similarity(docs[syn.lower()])
             if sim_score == 1:
                 return candidate
             score += sim_score
         scores.append(score)
-    
-    return max(zip(candidates, scores), key=lambda tuple: tuple[1])[0]
+
+    return max(zip(candidates, scores, strict=False), key=lambda tuple: tuple[1])[0]
 
 def is_date(val: str) -> bool:
     try:
         parse(val, fuzzy=False)
-        print(parse(val, fuzzy=False))
         return True
     except Exception:
         return False
@@ -0,0 +1,246 @@
+import json
+import re
+
+import frappe
+
+from hisaab.constants.doctypes import DOCTYPES
+from hisaab.utils.categorization import NUMBERED_BACKREFERENCE
+from hisaab.utils.nlp import get_nlp, make_doc, make_docs
+from hisaab.utils.profiling import count
+
+PATTERN_CACHE_KEY = "hisaab:pattern_definitions"
+
+# synonyms of each Transaction Entry column header, not a matcher pattern
+HEADER_ALIAS = "Header Alias"
+
+# matcher compiled by this process and the pattern version it was built from
+_COMPILED = {}
+
+# RegEx patterns compiled by this process and the pattern version they were built from
+_REGEX = {}
+
+# header alias vectors built by this process and the pattern version they were built from
+_ALIAS_INDEX = {}
+
+def get_pattern_definitions():
+    """
+    All Pattern Definitions grouped by type and target, read in a single query and
+    shared between workers through redis. Each rebuild gets a new version.
+    """
+    cache = frappe.cache()
+    definitions = cache.get_value(PATTERN_CACHE_KEY)
+    if definitions is None:
+        patterns = {}
+        for row in frappe.get_all(DOCTYPES.get("Pattern Definition"), fields=["for", "type", "pattern"]):
+            if row.pattern:
+                patterns.setdefault(row.type, {}).setdefault(row.get("for"), []).append(json.loads(row.pattern))
+
+        definitions = {"version": frappe.generate_hash(length=10), "patterns": patterns}
+        cache.set_value(PATTERN_CACHE_KEY, definitions)
+
+    return definitions
+
+def get_lookup_targets():
+
+    options = frappe.get_meta(
+        DOCTYPES.get("Pattern Definition"), cached=True
+        ).get_field("for").options.split('\n')
+
+    return [option for option in options if option != HEADER_ALIAS]
+
+def get_matcher(vocab):
+    """One Matcher with a label per lookup target, recompiled only when the pattern version changes."""
+    definitions = get_pattern_definitions()
+    if _COMPILED.get("version") == definitions["version"] and _COMPILED.get("vocab") is vocab:
+        return _COMPILED["matcher"]
+
+    from spacy.matcher import Matcher
+
+    matcher = Matcher(vocab)
+    spacy_patterns = definitions["patterns"].get("spaCy", {})
+    for target in get_lookup_targets():
+        if spacy_patterns.get(target):
+            matcher.add(target, spacy_patterns[target])
+
+    _COMPILED.update({"version": definitions["version"], "vocab": vocab, "matcher": matcher})
+
+    return matcher
+
+def find_info(text):
+    """
+    The first match of each lookup target in `text`, from the RegEx patterns.
+    spaCy tokenizes the text only when a target with spaCy patterns has no
+    RegEx match.
+    """
+    found = {}
+    for target, compiled in get_regex_index().items():
+        value = search_regex(compiled, text)
+        if value is not None:
+            found[target] = value
+    count("patterns.regex_hit", len(found))
+
+    spacy_patterns = get_pattern_definitions()["patterns"].get("spaCy", {})
+    missing = [target for target in get_lookup_targets() if target not in found and spacy_patterns.get(target)]
+    if missing:
+        count("patterns.spacy_fallback")
+        info = find_all_info(make_doc(text, "matcher"))
+        found.update({target: info[target] for target in missing if target in info})
+
+    return found
+
+def get_regex_index():
+    """One compiled expression per lookup target with RegEx patterns, recompiled only when the pattern version changes."""
+    definitions = get_pattern_definitions()
+    if _REGEX.get("version") == definitions["version"]:
+        return _REGEX["index"]
+
+    regex_patterns = definitions["patterns"].get("RegEx", {})
+    index = {}
+    for target in get_lookup_targets():
+        patterns = [pattern for definition in regex_patterns.get(target, []) for pattern in get_regex_patterns(definition)]
+        if patterns:
+            index[target] = compile_regex(patterns)
+
+    _REGEX.update({"version": definitions["version"], "index": index})
+
+    return index
+
+def get_regex_patterns(definition):
+    """The patterns of a RegEx Pattern Definition, a string or a list of strings."""
+    return [definition] if isinstance(definition, str) else definition
+
+def compile_regex(patterns):
+    """
+    All of `patterns` as one alternation, each wrapped in a named group so a match
+    tells which pattern it came from, along with each pattern on its own.
+    """
+    combined = "|".join(f"(?P<_{i}>{pattern})" for i, pattern in enumerate(patterns))
+
+    return re.compile(combined), [re.compile(pattern) for pattern in patterns]
+
+def search_regex(compiled, text):
+    """
+    The earliest match of any pattern in `text`: its first group when the pattern
+    has one, the whole match otherwise. None when nothing matches.
+    """
+    combined, patterns = compiled
+    match = combined.search(text)
+    if not match:
+        return None
+
+    # the wrapping group closes last, so it names the pattern that matched
+    pattern = patterns[int(match.lastgroup[1:])]
+    match = pattern.match(text, match.start())
+
+    return match.group(1) if pattern.groups else match.group(0)
+
+def find_all_info(spacy_doc):
+    """Run every lookup target over `spacy_doc` in one pass, returning the first match of each."""
+    found = {}
+    for match_id, start, end in get_matcher(spacy_doc.vocab)(spacy_doc):
+        target = spacy_doc.vocab.strings[match_id]
+        if target not in found:
+            found[target] = spacy_doc[start:end][-1].text
+
+    return found
+
+def get_header_aliases():
+    """Synonyms of every header key (date, description, debit, credit, balance) across all Header Alias definitions."""
+    aliases = {}
+    for definition in get_pattern_definitions()["patterns"].get("spaCy", {}).get(HEADER_ALIAS, []):
+        for key, synonyms in definition.items():
+            aliases.setdefault(key, [])
+            aliases[key].extend(synonym.lower() for synonym in synonyms if synonym.lower() not in aliases[key])
+
+    return aliases
+
+def get_alias_index():
+    """
+    Unit vectors of the Header Alias synonyms per header key, plus a lookup of the
+    exact synonyms. Rebuilt only when the pattern version changes.
+    """
+    import numpy as np
+
+    nlp = get_nlp("similarity")
+    version = get_pattern_definitions()["version"]
+    if _ALIAS_INDEX.get("version") == version and _ALIAS_INDEX.get("vocab") is nlp.vocab:
+        count("alias_index.hit")
+        return _ALIAS_INDEX
+
+    count("alias_index.miss")
+    aliases = get_header_aliases()
+    vectors = embed_texts([synonym for synonyms in aliases.values() for synonym in synonyms])
+
+    _ALIAS_INDEX.clear()
+    _ALIAS_INDEX.update({
+        "version": version,
+        "vocab": nlp.vocab,
+        "vectors": {key: np.array([vectors[synonym] for synonym in synonyms]) for key, synonyms in aliases.items()},
+        "exact": {key: set(synonyms) for key, synonyms in aliases.items()},
+    })
+
+    return _ALIAS_INDEX
+
+def embed_texts(texts):
+    """Unit length document vector of each distinct text, zero for texts without vectors."""
+    import numpy as np
+
+    texts = list(dict.fromkeys(texts))
+    if not texts:
+        return {}
+
+    docs = make_docs(texts, "similarity")
+    matrix = np.array([doc.vector for doc in docs], dtype=np.float32).reshape(len(texts), -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix = np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+    # one row per text, reshape fails first if the pipeline returned fewer docs
+    return dict(zip(texts, matrix, strict=True))
+
+def find_best_header(candidates, key, vectors, index):
+    """
+    Pick the candidate header most similar to the `key` synonyms, the way
+    find_best_candidate does with one matrix product. `vectors` maps each
+    lowercased candidate to its unit vector, see embed_texts.
+    """
+    import numpy as np
+
+    texts = [str(candidate).lower() for candidate in candidates]
+    exact = index["exact"].get(key, set())
+    for candidate, text in zip(candidates, texts, strict=True):
+        if text in exact:
+            return candidate
+
+    synonyms = index["vectors"].get(key)
+    if synonyms is None or not len(synonyms):
+        raise RuntimeError(f"No {HEADER_ALIAS} synonyms defined for {key}.")
+
+    scores = np.array([vectors[text] for text in texts]) @ synonyms.T
+
+    return candidates[int(np.argmax(scores.sum(axis=1)))]
+
+def validate_regex(definition, saved=()):
+    """
+    Raise if a RegEx Pattern Definition is not a string or list of strings that
+    compile, on their own and in the one expression get_regex_index builds with the
+    `saved` patterns of the same target. compile_regex names its own groups and
+    renumbers the patterns', so named groups and numbered backreferences are refused.
+    """
+    patterns = get_regex_patterns(definition)
+    if not isinstance(patterns, list) or not all(isinstance(pattern, str) for pattern in patterns):
+        raise RuntimeError("A RegEx pattern must be a string or a list of strings.")
+
+    try:
+        for pattern in patterns:
+            if re.compile(pattern).groupindex:
+                raise RuntimeError(f"Named groups are not allowed in RegEx patterns: {pattern}")
+            if NUMBERED_BACKREFERENCE.search(pattern):
+                raise RuntimeError(f"Numbered backreferences are not allowed in RegEx patterns: {pattern}")
+
+        compile_regex([*saved, *patterns])
+    except re.error as e:
+        raise RuntimeError(f"Invalid RegEx pattern: {e}") from e
+
+def clear_pattern_cache(doc=None, method=None):
+
+    frappe.cache().delete_value(PATTERN_CACHE_KEY)
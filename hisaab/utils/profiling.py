@@ -0,0 +1,87 @@
+import io
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+# lines of the cProfile report kept, sorted by cumulative time
+PROFILE_LINES = 60
+
+# the trace of the import running in this process, None when nothing is traced
+_TRACE = None
+
+def start_trace(profile=False):
+    """Start collecting spans and counters for this process, with a cProfile capture when `profile` is set."""
+    import cProfile
+
+    global _TRACE
+    _TRACE = {
+        "start": time.perf_counter(),
+        "spans": {},
+        "counters": {},
+        "profiler": cProfile.Profile() if profile else None,
+    }
+    if _TRACE["profiler"]:
+        _TRACE["profiler"].enable()
+
+def stop_trace():
+    """Stop the running trace and return its total seconds, spans, counters and profile report."""
+    global _TRACE
+    trace, _TRACE = _TRACE, None
+    if trace is None:
+        return None
+
+    profile = None
+    if trace["profiler"]:
+        import pstats
+
+        trace["profiler"].disable()
+        out = io.StringIO()
+        pstats.Stats(trace["profiler"], stream=out).sort_stats("cumulative").print_stats(PROFILE_LINES)
+        profile = out.getvalue()
+
+    return {
+        "total_seconds": round(time.perf_counter() - trace["start"], 4),
+        "spans": {
+            name: {**span, "seconds": round(span["seconds"], 4)} for name, span in trace["spans"].items()
+        },
+        "counters": trace["counters"],
+        "profile": profile,
+    }
+
+@contextmanager
+def span(name, rows=None):
+    """
+    Time the block under `name`. Spans sharing a name add up their calls, seconds
+    and rows, the rows can also be set on the yielded dict once they are known.
+    Costs one dict when no trace is running.
+    """
+    record = {"rows": rows}
+    if _TRACE is None:
+        yield record
+        return
+
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        seconds = time.perf_counter() - start
+        if _TRACE is not None:
+            total = _TRACE["spans"].setdefault(name, {"calls": 0, "seconds": 0.0, "rows": 0})
+            total["calls"] += 1
+            total["seconds"] += seconds
+            total["rows"] += record["rows"] or 0
+
+def traced(name):
+    """Decorator running the function inside span(`name`)."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def count(name, n=1):
+    """Add `n` to the counter `name` of the running trace, e.g. a cache hit or miss."""
+    if _TRACE is not None:
+        _TRACE["counters"][name] = _TRACE["counters"].get(name, 0) + n
@@ -0,0 +1,128 @@
+import frappe
+from frappe.query_builder import Order
+from frappe.query_builder.functions import Count, Sum
+from pypika.terms import PseudoColumn
+
+from hisaab.constants.doctypes import DOCTYPES
+
+# composite indexes on Transaction Entry, added by its on_doctype_update. every
+# query below filters on a leading run of one of them and ranges on the date last
+TRANSACTION_ENTRY_INDEXES = [
+    ["account", "transaction_date"],
+    ["account", "subtype", "transaction_date"],
+    ["account", "type", "transaction_date"],
+    ["account", "balance_status", "transaction_date"],
+]
+
+ENTRY_FIELDS = [
+    "name", "transaction_date", "party", "type", "subtype", "debit_amount", "credit_amount", "remaining_balance",
+]
+
+def get_index_name(fields):
+
+    # the name frappe.db.add_index gives an index when none is passed
+    return "_".join(fields) + "_index"
+
+def get_existing_hashes(hashes):
+    """The `hashes` already stored, answered from the unique txn_hash index alone."""
+    if not len(hashes):
+        return set()
+
+    entry = frappe.qb.DocType(DOCTYPES.get("Transaction Entry"))
+    query = frappe.qb.from_(entry).select(entry.txn_hash).where(entry.txn_hash.isin(list(hashes)))
+
+    return set(query.run(pluck=True))
+
+def get_stored_entries(names):
+    """(name, txn_hash) of the entries stored under `names`, looked up on the primary key."""
+    if not len(names):
+        return set()
+
+    entry = frappe.qb.DocType(DOCTYPES.get("Transaction Entry"))
+    query = frappe.qb.from_(entry).select(entry.name, entry.txn_hash).where(entry.name.isin(list(names)))
+
+    return {tuple(row) for row in query.run()}
+
+def get_permission_condition(doctype):
+    """
+    The match conditions frappe.get_list adds for the session user, as SQL: owner
+    only roles, User Permissions and permission query conditions. None when the
+    user sees every row.
+    """
+    from frappe.model.db_query import DatabaseQuery
+
+    condition = DatabaseQuery(doctype).build_match_conditions()
+
+    # only queries filtering on an account carry it, so the query builder always binds a value
+    # and the driver formats the query, reading a doubled % as a literal one
+    return condition.replace("%", "%%") if condition else None
+
+def get_entries_query(account, from_date=None, to_date=None, type=None, subtype=None, fields=None, condition=None):
+
+    entry = frappe.qb.DocType(DOCTYPES.get("Transaction Entry"))
+    query = frappe.qb.from_(entry).select(*[entry[field] for field in fields or ENTRY_FIELDS])
+
+    if condition and not account:
+        # with nothing bound, the %% in the condition would reach the database as is
+        raise RuntimeError("A permission condition needs an account to filter on.")
+
+    # equality filters first, in index column order, then the date range
+    query = query.where(entry.account == account) if account else query.where(entry.account.isnull())
+    if subtype:
+        query = query.where(entry.subtype == subtype)
+    elif type:
+        query = query.where(entry.type == type)
+    if from_date:
+        query = query.where(entry.transaction_date >= from_date)
+    if to_date:
+        query = query.where(entry.transaction_date <= to_date)
+    if condition:
+        query = query.where(PseudoColumn(condition))
+
+    return query
+
+def get_entries(account, from_date=None, to_date=None, type=None, subtype=None, fields=None, start=0, page_length=500,
+                after=None, condition=None):
+    """
+    One page of an account's entries in a date range, in index order (date, then
+    name). With `after`, a (transaction_date, name) pair, the page starts right
+    after that entry instead of skipping `start` rows: the index is entered at that
+    key, so a page deep into the history costs what the first one does.
+    `condition` is raw SQL, see get_permission_condition.
+    """
+    entry = frappe.qb.DocType(DOCTYPES.get("Transaction Entry"))
+    query = get_entries_query(account, from_date, to_date, type, subtype, fields, condition)
+    query = query.orderby(entry.transaction_date, order=Order.asc).orderby(entry.name, order=Order.asc)
+    if type and subtype:
+        # subtype took the index, type is checked on the rows it returns
+        query = query.where(entry.type == type)
+
+    if after:
+        # the secondary indexes end with the primary key, so (date, name) is their order too
+        date, name = after
+        query = query.where(entry.transaction_date >= date).where(
+            (entry.transaction_date > date) | (entry.name > name)
+        )
+        return query.limit(page_length).run(as_dict=True)
+
+    return query.limit(page_length).offset(start).run(as_dict=True)
+
+def get_range_totals(account, from_date=None, to_date=None, type=None, subtype=None, group_by="subtype", condition=None):
+    """Entry count, debit and credit of an account's entries in a date range, grouped by `group_by`."""
+    if group_by not in ("subtype", "type"):
+        raise RuntimeError(f"Range totals can only be grouped by subtype or type, not {group_by}.")
+
+    entry = frappe.qb.DocType(DOCTYPES.get("Transaction Entry"))
+    query = (
+        get_entries_query(account, from_date, to_date, type, subtype, fields=[group_by], condition=condition)
+        .select(
+            Count(entry.name).as_("entry_count"),
+            Sum(entry.debit_amount).as_("total_debit"),
+            Sum(entry.credit_amount).as_("total_credit"),
+        )
+        .groupby(entry[group_by])
+    )
+    if type and subtype:
+        query = query.where(entry.type == type)
+
+    return query.run(as_dict=True)
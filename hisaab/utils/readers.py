@@ -0,0 +1,332 @@
+import csv
+import os
+import zipfile
+from collections import Counter
+from functools import lru_cache
+from html.parser import HTMLParser
+
+import pandas as pd
+
+from hisaab.utils.column_types import classify_frame, get_transaction_rows
+
+# rows per DataFrame yielded by the chunked readers
+CHUNK_SIZE = 5000
+
+# rows read from the top of each sheet to pick the one holding the transactions
+PREVIEW_ROWS = 100
+
+# first bytes of the binary formats, text files are told apart by their content
+MAGIC_BYTES = {
+    b"PK\x03\x04": "zip",
+    b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1": "xls",
+    b"%PDF": "pdf",
+}
+
+# separators a text statement may use, in order of preference
+DELIMITERS = [",", "\t", ";", "|"]
+
+# byte order marks of the text encodings banks export csv and tab separated files in
+TEXT_ENCODINGS = {
+    b"\xef\xbb\xbf": "utf-8-sig",
+    b"\xff\xfe": "utf-16",
+    b"\xfe\xff": "utf-16",
+}
+
+def iter_statement_chunks(path, chunk_size=CHUNK_SIZE):
+    """
+    Yield the transaction sheet of the statement at `path` as DataFrames of `chunk_size` rows.
+
+    Every row of the sheet is data (there is no header row), columns are numbered
+    from 0 and the index is the row's position in the sheet, so chunks line up
+    with each other. Only one chunk is held in memory at a time for xlsx, xls and
+    csv files. The format is sniffed from the file's content and the sheet picked
+    from the first rows of each, see get_statement_sheet.
+    """
+    file_format, sheet = get_statement_sheet(path)
+    rows = READERS[file_format](path, sheet)
+
+    position = 0
+    width = 0
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            df = to_frame(chunk, position, width)
+            width = df.shape[1]
+            position += len(chunk)
+            chunk = []
+            yield df
+
+    if chunk:
+        yield to_frame(chunk, position, width)
+
+def get_statement_sheet(path):
+    """The format of the statement at `path` and the index of its transaction sheet, worked out once per version of the file."""
+    stat = os.stat(path)
+
+    return find_statement_sheet(path, stat.st_mtime_ns, stat.st_size)
+
+@lru_cache(maxsize=64)
+def find_statement_sheet(path, mtime, size):
+
+    file_format = sniff_format(path)
+
+    return file_format, pick_sheet(PREVIEWS[file_format](path))
+
+def sniff_format(path):
+    """
+    xlsx, xls, ods, html or csv, from the first bytes of the file rather than its
+    extension: banks hand out csv and html tables named .xls.
+    """
+    with open(path, "rb") as f:
+        head = f.read(2048)
+
+    file_format = next((name for magic, name in MAGIC_BYTES.items() if head.startswith(magic)), None)
+    if file_format == "zip":
+        return get_zip_format(path)
+    if file_format == "pdf":
+        raise RuntimeError("PDF statements can not be read, download the statement as a spreadsheet or csv instead.")
+    if file_format:
+        return file_format
+
+    text = decode_head(head).lstrip().lower()
+    if text.startswith(("<!doctype html", "<html", "<table")) or "<table" in text:
+        return "html"
+
+    return "csv"
+
+def get_zip_format(path):
+
+    with zipfile.ZipFile(path) as archive:
+        names = set(archive.namelist())
+
+    if "xl/workbook.xml" in names:
+        return "xlsx"
+    if "content.xml" in names:
+        return "ods"
+
+    raise RuntimeError("The statement is a zip archive, not a spreadsheet.")
+
+def get_text_encoding(head):
+
+    return next((encoding for bom, encoding in TEXT_ENCODINGS.items() if head.startswith(bom)), "utf-8-sig")
+
+def decode_head(head):
+
+    return head.decode(get_text_encoding(head), errors="replace")
+
+def pick_sheet(previews):
+    """
+    Index of the sheet whose first rows hold the most transaction-like rows, the
+    longest sheet on a tie. `previews` has the first rows and the row count, when
+    known without reading the sheet, of every sheet.
+    """
+    if len(previews) <= 1:
+        return 0
+
+    scores = []
+    for rows, row_count in previews:
+        txn_rows = int(get_transaction_rows(classify_frame(pd.DataFrame(rows))).sum()) if rows else 0
+        scores.append((txn_rows, row_count or len(rows)))
+
+    return max(range(len(scores)), key=lambda index: scores[index])
+
+def to_frame(rows, position, width=0):
+
+    df = pd.DataFrame(rows)
+    df.index = pd.RangeIndex(position, position + len(rows))
+
+    # rows can be ragged, keep at least as many columns as earlier chunks had
+    if df.shape[1] < width:
+        df = df.reindex(columns=range(width))
+
+    return df.infer_objects()
+
+def iter_rows_xlsx(path, sheet=0):
+
+    from openpyxl import load_workbook
+
+    # read only workbooks parse a worksheet only when its rows are iterated
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        yield from workbook.worksheets[sheet].iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+def preview_xlsx(path):
+
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        if len(workbook.worksheets) == 1:
+            return [([], None)]
+
+        # the row count comes from the sheet's dimension record, only the first rows are parsed
+        return [
+            (list(worksheet.iter_rows(max_row=PREVIEW_ROWS, values_only=True)), worksheet.max_row)
+            for worksheet in workbook.worksheets
+        ]
+    finally:
+        workbook.close()
+
+def iter_rows_xls(path, sheet=0):
+
+    import xlrd
+
+    workbook = xlrd.open_workbook(path, on_demand=True)
+    try:
+        worksheet = workbook.sheet_by_index(sheet)
+        for index in range(worksheet.nrows):
+            yield get_xls_row(workbook, worksheet, index)
+    finally:
+        workbook.release_resources()
+
+def preview_xls(path):
+
+    import xlrd
+
+    # on demand workbooks load one sheet at a time, each is released once previewed. xlrd
+    # decodes a whole sheet to give any row of it, so a sheet is never read only in part
+    workbook = xlrd.open_workbook(path, on_demand=True)
+    try:
+        if workbook.nsheets == 1:
+            return [([], None)]
+
+        previews = []
+        for sheet in range(workbook.nsheets):
+            worksheet = workbook.sheet_by_index(sheet)
+            rows = [get_xls_row(workbook, worksheet, index) for index in range(min(worksheet.nrows, PREVIEW_ROWS))]
+            previews.append((rows, worksheet.nrows))
+            workbook.unload_sheet(sheet)
+
+        return previews
+    finally:
+        workbook.release_resources()
+
+def get_xls_row(workbook, worksheet, index):
+
+    import xlrd
+
+    row = []
+    for cell in worksheet.row(index):
+        if cell.ctype == xlrd.XL_CELL_DATE:
+            row.append(xlrd.xldate_as_datetime(cell.value, workbook.datemode))
+        elif cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK):
+            row.append(None)
+        else:
+            row.append(cell.value)
+
+    return row
+
+def iter_rows_csv(path, sheet=0):
+
+    with open(path, "rb") as f:
+        head = f.read(8192)
+
+    with open(path, newline="", encoding=get_text_encoding(head), errors="replace") as f:
+        for row in csv.reader(f, delimiter=get_delimiter(decode_head(head))):
+            yield [value if value.strip() else None for value in row]
+
+def get_delimiter(sample):
+    """
+    The separator splitting the most lines of `sample` into the same number of
+    fields, so the transaction rows decide rather than the details above them or a
+    separator inside amounts and narrations. Tab and semicolon separated exports
+    are common.
+    """
+    lines = sample.splitlines()[:-1] or sample.splitlines()
+
+    # comma wins a tie
+    return max(DELIMITERS, key=lambda delimiter: get_consistent_lines(lines, delimiter))
+
+def get_consistent_lines(lines, delimiter):
+    """Lines of the most common field count above one, with quoted fields read as csv reads them."""
+    counts = Counter(len(row) for row in csv.reader(lines, delimiter=delimiter) if len(row) > 1)
+
+    return max(counts.values(), default=0)
+
+def preview_single_sheet(path):
+
+    return [([], None)]
+
+def iter_rows_html(path, sheet=0):
+
+    yield from read_html_tables(path)[sheet]
+
+def preview_html(path):
+
+    return [(table[:PREVIEW_ROWS], len(table)) for table in read_html_tables(path)]
+
+def read_html_tables(path):
+    """Cell text of every table in an html page, a list of rows per table."""
+    with open(path, "rb") as f:
+        content = f.read()
+
+    parser = TableParser()
+    parser.feed(content.decode(get_text_encoding(content), errors="replace"))
+    parser.close()
+
+    return [table for table in parser.tables if table] or [[]]
+
+class TableParser(HTMLParser):
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.tables = []
+        self.row = None
+        self.cell = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "table":
+            self.tables.append([])
+        elif tag == "tr" and self.tables:
+            self.row = []
+        elif tag in ("td", "th") and self.row is not None:
+            self.cell = []
+
+    def handle_endtag(self, tag):
+        if tag in ("td", "th") and self.cell is not None:
+            text = " ".join("".join(self.cell).split())
+            self.row.append(text or None)
+            self.cell = None
+        elif tag == "tr" and self.row is not None:
+            self.tables[-1].append(self.row)
+            self.row = None
+
+    def handle_data(self, data):
+        if self.cell is not None:
+            self.cell.append(data)
+
+def iter_rows_pandas(path, sheet=0):
+
+    # formats without a streaming reader (ods and the like) are read whole
+    df = pd.read_excel(path, header=None, sheet_name=sheet)
+    yield from df.itertuples(index=False, name=None)
+
+def preview_pandas(path):
+
+    sheets = pd.ExcelFile(path).sheet_names
+    if len(sheets) == 1:
+        return [([], None)]
+
+    return [
+        (list(pd.read_excel(path, header=None, sheet_name=sheet, nrows=PREVIEW_ROWS).itertuples(index=False, name=None)), None)
+        for sheet in range(len(sheets))
+    ]
+
+READERS = {
+    "xlsx": iter_rows_xlsx,
+    "xls": iter_rows_xls,
+    "ods": iter_rows_pandas,
+    "html": iter_rows_html,
+    "csv": iter_rows_csv,
+}
+
+PREVIEWS = {
+    "xlsx": preview_xlsx,
+    "xls": preview_xls,
+    "ods": preview_pandas,
+    "html": preview_html,
+    "csv": preview_single_sheet,
+}
@@ -0,0 +1,60 @@
+# Copyright (c) 2026, Pradyot Raina and Contributors
+# See license.txt
+
+from contextlib import nullcontext
+from unittest.mock import patch
+
+from frappe.tests.utils import FrappeTestCase
+
+from hisaab.utils import nlp
+from hisaab.utils.parsing import find_best_candidate
+
+
+class FakeNLP:
+	def __init__(self):
+		self.piped = []
+
+	def select_pipes(self, enable):
+		return nullcontext()
+
+	def pipe(self, texts, batch_size, n_process):
+		texts = list(texts)
+		self.piped.append(texts)
+		return (f"doc:{text}" for text in texts)
+
+
+class TestNLP(FrappeTestCase):
+	def test_docs_are_piped_once_per_text(self):
+		model = FakeNLP()
+		long_text = "x" * (nlp.DOC_CACHE_MAX_CHARS + 1)
+		with patch.dict(nlp._MODELS, {nlp.DEFAULT_MODEL: model}), patch.object(nlp, "_DOCS", type(nlp._DOCS)()):
+			docs = nlp.make_docs(["date", "narration", "date", long_text])
+			self.assertEqual(docs, ["doc:date", "doc:narration", "doc:date", f"doc:{long_text}"])
+
+			self.assertEqual(nlp.make_docs(["narration", "balance", long_text]), ["doc:narration", "doc:balance", f"doc:{long_text}"])
+			self.assertEqual(nlp.make_doc("date"), "doc:date")
+
+		# repeats within a call and texts seen before are not piped again, long texts are not kept
+		self.assertEqual(model.piped, [["date", "narration", long_text], ["balance", long_text]])
+
+	def test_every_text_gets_its_own_doc(self):
+		model = FakeNLP()
+		with patch.dict(nlp._MODELS, {nlp.DEFAULT_MODEL: model}), patch.object(nlp, "_DOCS", type(nlp._DOCS)()):
+			self.assertEqual(len(nlp.make_docs(["a", "b", "a", "c"])), 4)
+
+			# a pipeline dropping a text would otherwise pair the others with the wrong Docs
+			model.pipe = lambda texts, batch_size, n_process: iter(["doc:d"])
+			with self.assertRaises(ValueError):
+				nlp.make_docs(["d", "e"])
+
+	def test_best_candidate_compares_each_text_once(self):
+		class Doc(str):
+			def similarity(self, other):
+				return 1.0 if self == other else 0.5 * (self[0] == other[0])
+
+		def make_docs(texts, task):
+			return [Doc(text) for text in texts]
+
+		with patch("hisaab.utils.parsing.make_docs", make_docs):
+			self.assertEqual(find_best_candidate(["Narration", "Debit Amt"], ["dr", "debit"]), "Debit Amt")
+			self.assertEqual(find_best_candidate(["Debit Amt", "Debit"], ["dr", "debit"]), "Debit")